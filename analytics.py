@@ -0,0 +1,217 @@
+import calendar
+import math
+import threading
+import time
+
+
+DIGEST_PERIOD = 24 * 3600
+BUCKET_BASE = 60
+BUCKET_FACTOR = math.sqrt(2)
+BUCKETS = 32
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+SINCE_FORMAT = '%d.%m.%Y %H:%M'
+VERDICTS = ('approved', 'rejected')
+
+DIGEST = ('Сводка по работам с {since} UTC:\n'
+          'На проверке сейчас: {reviewing}\n'
+          'Взято на проверку: {taken}\n'
+          'Принято: {approved}\n'
+          'Возвращено с замечаниями: {rejected}\n'
+          'Медиана времени проверки: {median}')
+NO_MEDIAN = 'нет данных'
+
+
+def parse_date(value, default):
+    """Метка времени из date_updated API или `default`."""
+    try:
+        return calendar.timegm(time.strptime(value, DATE_FORMAT))
+    except (TypeError, ValueError):
+        return default
+
+
+def bucket(seconds):
+    """Номер корзины гистограммы для длительности проверки."""
+    if seconds < BUCKET_BASE:
+        return 0
+    return min(int(math.log(seconds / BUCKET_BASE, BUCKET_FACTOR)) + 1,
+               BUCKETS - 1)
+
+
+def bucket_middle(index):
+    """Середина корзины в секундах (геометрическая)."""
+    if index == 0:
+        return BUCKET_BASE / 2
+    return BUCKET_BASE * BUCKET_FACTOR ** (index - 0.5)
+
+
+def format_duration(seconds):
+    """Длительность для сводки."""
+    if seconds < 3600:
+        return f'~{round(seconds / 60)} мин'
+    if seconds < 2 * 24 * 3600:
+        return f'~{seconds / 3600:.1f} ч'
+    return f'~{seconds / 86400:.1f} дн'
+
+
+class ChatStats:
+    """Агрегаты чата: работы на проверке и итоги текущего периода."""
+
+    def __init__(self, reviewing=0, taken=0, approved=0, rejected=0,
+                 durations=None):
+        """Агрегаты, при необходимости восстановленные с диска."""
+        self.reviewing = reviewing
+        self.taken = taken
+        self.approved = approved
+        self.rejected = rejected
+        self.durations = durations or [0] * BUCKETS
+
+    def median(self):
+        """Медиана времени проверки по гистограмме или None."""
+        total = sum(self.durations)
+        if not total:
+            return None
+        seen = 0
+        for index, count in enumerate(self.durations):
+            seen += count
+            if seen * 2 >= total:
+                return bucket_middle(index)
+
+    def reset(self):
+        """Начинает новый период; число работ на проверке сохраняется."""
+        self.taken = self.approved = self.rejected = 0
+        self.durations = [0] * BUCKETS
+
+    def snapshot(self):
+        """Состояние для сохранения на диск."""
+        return dict(vars(self))
+
+
+class ReviewAnalytics:
+    """Инкрементальная статистика проверок для периодических сводок.
+
+    Получает каждую смену статуса, разобранную parse_status, и за O(1)
+    обновляет агрегаты чата: число работ на проверке, счётчики
+    за период и гистограмму времени от взятия на проверку до вердикта
+    (медиана по ней точна до ширины корзины, около 20%). История
+    не хранится и не перечитывается: помнится только последний статус
+    каждой работы, чтобы не посчитать один переход дважды. Работы
+    с итоговым вердиктом забываются, как только сохранённая метка
+    времени подписки ушла дальше их date_updated: API их больше
+    не вернёт.
+
+    Несколько узлов сводят статистику через общую базу: каждый узел
+    отдаёт в collect накопленные изменения агрегатов, а сводки строятся
+    по сумме, переданной в digests.
+    """
+
+    def __init__(self, period=DIGEST_PERIOD, saved=None, now=None):
+        """Статистика со сводками раз в `period` секунд."""
+        saved = saved or {}
+        self.period = period
+        self.lock = threading.Lock()
+        self.works = {tuple(key.split('\n', 1)): tuple(value)
+                      for key, value in saved.get('works', {}).items()}
+        self.chats = {chat_id: ChatStats(**stats)
+                      for chat_id, stats in saved.get('chats', {}).items()}
+        self.next_digest = saved.get('next_digest') or (
+            (time.time() if now is None else now) + period)
+
+    def update(self, subscription, homework, message=None):
+        """Учитывает смену статуса работы."""
+        chat_id = str(subscription.chat_id)
+        key = (subscription.name, homework['homework_name'])
+        status = homework['status']
+        at = parse_date(homework.get('date_updated'), time.time())
+        with self.lock:
+            previous, since, _ = self.works.get(key, (None, None, None))
+            if previous == status:
+                return
+            self.works[key] = (status, at, chat_id)
+            stats = self.chats.setdefault(chat_id, ChatStats())
+            if previous == 'reviewing':
+                stats.reviewing -= 1
+            if status == 'reviewing':
+                stats.reviewing += 1
+                stats.taken += 1
+            elif status in VERDICTS:
+                setattr(stats, status, getattr(stats, status) + 1)
+                if previous == 'reviewing':
+                    stats.durations[bucket(max(at - since, 0))] += 1
+
+    def evict(self, progress):
+        """Забывает работы, которые опрос уже не вернёт.
+
+        `progress` — сохранённые метки времени подписок, которые
+        опрашивает этот узел. Работы остальных подписок (удалённых или
+        ушедших к другому узлу) забываются все, а стоявшие на проверке
+        вычитаются из числа работ на проверке их чата.
+        """
+        with self.lock:
+            works = {}
+            for key, (status, at, chat_id) in self.works.items():
+                if key[0] in progress:
+                    if status not in VERDICTS or at >= progress[key[0]]:
+                        works[key] = (status, at, chat_id)
+                elif status == 'reviewing':
+                    self.chats.setdefault(
+                        chat_id, ChatStats()).reviewing -= 1
+            self.works = works
+
+    def collect(self, publish):
+        """Передаёт `publish` накопленные изменения агрегатов и обнуляет их.
+
+        Обнуляется и число работ на проверке: дальше оно копится как
+        изменение к уже переданному. Если `publish` упал, изменения
+        остаются до следующего раза.
+        """
+        with self.lock:
+            publish({chat_id: stats.snapshot()
+                     for chat_id, stats in self.chats.items()})
+            self.chats = {}
+
+    def due(self, now=None):
+        """Пора ли отправлять сводки."""
+        now = time.time() if now is None else now
+        return now >= self.next_digest
+
+    def digest(self, stats, since):
+        """Текст сводки одного чата."""
+        median = stats.median()
+        return DIGEST.format(
+            since=since, reviewing=stats.reviewing, taken=stats.taken,
+            approved=stats.approved, rejected=stats.rejected,
+            median=NO_MEDIAN if median is None else format_duration(median))
+
+    def digests(self, now=None, chats=None):
+        """Сводки всех чатов за истёкший период; начинает новый.
+
+        `chats` — агрегаты чатов, сведённые из общей базы узлов, вместо
+        собственных. Возвращает пары (чат, текст) и метку начала нового
+        периода.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            started = self.next_digest
+            since = time.strftime(SINCE_FORMAT,
+                                  time.gmtime(started - self.period))
+            digests = [(chat_id, self.digest(stats, since))
+                       for chat_id, stats in (
+                           self.chats.items() if chats is None else
+                           ((chat_id, ChatStats(**stats))
+                            for chat_id, stats in chats.items()))]
+            for stats in self.chats.values():
+                stats.reset()
+            while self.next_digest <= now:
+                self.next_digest += self.period
+        return digests, started
+
+    def snapshot(self):
+        """Состояние для сохранения на диск."""
+        with self.lock:
+            return {
+                'works': {'\n'.join(key): list(value)
+                          for key, value in self.works.items()},
+                'chats': {chat_id: stats.snapshot()
+                          for chat_id, stats in self.chats.items()},
+                'next_digest': self.next_digest,
+            }
@@ -0,0 +1,83 @@
+import logging
+import threading
+
+
+QUEUE_CAPACITY = 10000
+HIGH_WATERMARK = 0.8
+LOW_WATERMARK = 0.5
+
+NORMAL, SHEDDING, PAUSED = 'normal', 'shedding', 'paused'
+
+MODE_CHANGED = ('Очередь отправки {size} из {capacity}: режим опроса '
+                '{old} -> {new}')
+QUEUE_STATS = ('Очередь отправки {size} из {capacity}, пик {peak}, '
+               'режим {mode}, отложено опросов {skipped}')
+
+
+class Backpressure:
+    """Обратное давление очереди отправки на опрос.
+
+    Перед каждым опросом смотрит, сколько уведомлений ждёт отправки.
+    Выше верхней отметки (`high` от ёмкости) откладываются подписки
+    с приоритетом 0, при полной очереди — все; опрос возобновляется,
+    когда очередь опустится ниже нижней отметки. Отложенная подписка
+    сохраняет метку времени и при следующем опросе получит всё
+    пропущенное, так что уведомления не теряются, а очередь не растёт
+    больше ёмкости плюс одного ответа на поток опроса. Уведомления,
+    которые нельзя доставить, outbox снимает с очереди, поэтому
+    заблокированный чат не копит очередь и не останавливает опрос.
+    """
+
+    def __init__(self, queue, capacity=QUEUE_CAPACITY, high=HIGH_WATERMARK,
+                 low=LOW_WATERMARK):
+        """Следит за очередью `queue` ёмкостью `capacity` уведомлений."""
+        self.queue = queue
+        self.capacity = capacity
+        self.high = int(capacity * high)
+        self.low = int(capacity * low)
+        self.lock = threading.Lock()
+        self.mode = NORMAL
+        self.peak = 0
+        self.skipped = 0
+
+    def observe(self):
+        """Обновляет режим по текущему размеру очереди."""
+        size = len(self.queue)
+        with self.lock:
+            self.peak = max(self.peak, size)
+            old = self.mode
+            if size >= self.capacity:
+                self.mode = PAUSED
+            elif size >= self.high:
+                self.mode = SHEDDING
+            elif size <= self.low:
+                self.mode = NORMAL
+            elif self.mode == PAUSED:
+                self.mode = SHEDDING
+            mode = self.mode
+        if mode != old:
+            logging.warning(MODE_CHANGED.format(
+                size=size, capacity=self.capacity, old=old, new=mode))
+        return mode
+
+    def admit(self, subscription):
+        """Можно ли сейчас опросить подписку."""
+        mode = self.observe()
+        if mode == NORMAL or mode == SHEDDING and subscription.priority > 0:
+            return True
+        with self.lock:
+            self.skipped += 1
+        return False
+
+    def report(self):
+        """Отметки очереди за цикл для лога; пик и счётчик сбрасываются."""
+        size = len(self.queue)
+        with self.lock:
+            peak, skipped = max(self.peak, size), self.skipped
+            self.peak, self.skipped = size, 0
+            mode = self.mode
+        if peak or skipped:
+            logging.info(QUEUE_STATS.format(
+                size=size, capacity=self.capacity, peak=peak, mode=mode,
+                skipped=skipped))
+        return dict(size=size, peak=peak, mode=mode, skipped=skipped)
@@ -0,0 +1,62 @@
+"""Время декодирования ответа API на один опрос для каждого декодера.
+
+Запуск: python benchmarks/bench_codec.py
+"""
+import json
+import os
+import sys
+import timeit
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import ResponseCodec, available  # noqa: E402
+
+SIZES = (0, 1, 10, 100, 1000)
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+def make_payload(size):
+    """Тело ответа homework_statuses с `size` работами."""
+    return json.dumps({
+        'homeworks': [{
+            'id': 124000 + number,
+            'status': STATUSES[number % len(STATUSES)],
+            'homework_name': f'username__hw_python_oop_{number}.zip',
+            'reviewer_comment': ('Отличная работа! Обратите внимание '
+                                 'на имена переменных и докстринги.'),
+            'date_updated': '2022-02-13T14:40:57Z',
+            'lesson_name': f'Спринт {number % 20}: итоговый проект',
+        } for number in range(size)],
+        'current_date': 1644764457,
+    }, ensure_ascii=False).encode()
+
+
+def make_response(payload):
+    """Ответ requests с готовым телом, как после запроса к API."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = payload
+    return response
+
+
+def main():
+    """Печатает таблицу: строки — размеры ответа, столбцы — декодеры."""
+    backends = [('requests .json()', lambda response: response.json())]
+    backends += [(name, ResponseCodec(name).decode) for name in available()]
+    print(f'{"homeworks":>9} {"bytes":>8} ' + ' '.join(
+        f'{name + ", µs":>20}' for name, _ in backends))
+    for size in SIZES:
+        payload = make_payload(size)
+        response = make_response(payload)
+        number = max(10, 20000 // (size + 1))
+        times = [min(timeit.repeat(lambda: decode(response), number=number,
+                                   repeat=5)) / number
+                 for _, decode in backends]
+        print(f'{size:>9} {len(payload):>8} ' + ' '.join(
+            f'{elapsed * 1e6:>20.1f}' for elapsed in times))
+
+
+if __name__ == '__main__':
+    main()
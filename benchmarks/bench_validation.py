@@ -0,0 +1,71 @@
+"""Сравнение проверки ответа API по схеме с прежними ручными проверками.
+
+Запуск: python benchmarks/bench_validation.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+
+SIZES = (10, 1000, 100000)
+
+
+def make_response(size):
+    """Ответ API с `size` работами."""
+    statuses = tuple(homework.HOMEWORK_VERDICTS)
+    return {
+        'homeworks': [{
+            'id': number,
+            'status': statuses[number % len(statuses)],
+            'homework_name': f'student__hw{number}.zip',
+            'reviewer_comment': 'Всё нравится',
+            'date_updated': '2022-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        } for number in range(size)],
+        'current_date': 1644764457,
+    }
+
+
+def manual(response):
+    """Ручные проверки isinstance и ключей, как до появления схемы."""
+    if not isinstance(response, dict):
+        raise TypeError(f'В ответе API не словарь, а {type(response)}')
+    if 'homeworks' not in response:
+        raise KeyError('Ключа "homeworks" в словаре нет')
+    homeworks = response['homeworks']
+    if not isinstance(homeworks, list):
+        raise TypeError(f'homeworks не список, а {type(homeworks)}')
+    for item in homeworks:
+        if not isinstance(item, dict):
+            raise TypeError(f'Домашка не словарь, а {type(item)}')
+        status = item['status']
+        if status not in homework.HOMEWORK_VERDICTS:
+            raise ValueError(f'Неизвестный статус: {status}')
+        if 'homework_name' not in item:
+            raise KeyError('Не найден ключ "homework_name"!')
+        if not isinstance(item['homework_name'], str):
+            raise TypeError('homework_name не строка')
+    return homeworks
+
+
+def main():
+    """Печатает время обеих проверок для ответов разного размера."""
+    print(f'{"size":>8} {"manual, ms":>12} {"schema, ms":>12} {"speedup":>8}')
+    for size in SIZES:
+        response = make_response(size)
+        number = max(1, 100000 // size)
+        manual_time = min(timeit.repeat(
+            lambda: manual(response), number=number, repeat=5)) / number
+        schema_time = min(timeit.repeat(
+            lambda: homework.RESPONSE_VALIDATOR.validate(response),
+            number=number, repeat=5)) / number
+        print(f'{size:>8} {manual_time * 1000:>12.3f} '
+              f'{schema_time * 1000:>12.3f} '
+              f'{manual_time / schema_time:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+
+import telegram
+
+from bot_pool import is_permanent
+
+
+DEBOUNCE = 5
+FLUSH_PERIOD = 1
+RETRY_BASE = 5
+RETRY_MAX = 600
+MAX_LENGTH = telegram.constants.MAX_MESSAGE_LENGTH
+
+BOARD_TITLE = 'Статусы работ:'
+BOARD_LINE = '• {name}: {verdict}'
+BOARD_MORE = '… и ещё работ: {count}'
+BOARD_CREATED = 'В чате {chat_id} создана доска статусов'
+BOARD_EDITED = 'Доска статусов в чате {chat_id} обновлена'
+BOARD_ERROR = 'Не удалось обновить доску в чате {chat_id}: {error}'
+BOARD_RETRY = 'Доска в чате {chat_id}: повтор через {seconds:.0f} с'
+BOARD_DROPPED = ('Доска в чате {chat_id} отключена до следующего '
+                 'изменения: Telegram не примет её и при повторе ({error})')
+BOARD_PIN_ERROR = 'Не удалось закрепить доску в чате {chat_id}: {error}'
+NOT_MODIFIED = 'message is not modified'
+NOT_FOUND = 'message to edit not found'
+
+
+class Board:
+    """Доска одного чата: последние статусы и закреплённое сообщение."""
+
+    def __init__(self, statuses=None, message_id=None, rendered=None):
+        """Доска из сохранённых статусов и номера сообщения."""
+        self.statuses = dict(statuses or {})
+        self.message_id = message_id
+        self.rendered = rendered
+        self.changed_at = None
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def snapshot(self):
+        """Состояние доски для сохранения на диск."""
+        return {'statuses': self.statuses, 'message_id': self.message_id,
+                'rendered': self.rendered}
+
+
+class BoardManager:
+    """Режим доски: одно закреплённое сообщение на чат вместо потока.
+
+    Изменения статусов копятся и выводятся одной правкой, когда
+    в чате `debounce` секунд не было новых изменений. Последний
+    отправленный текст кэшируется, поэтому правки без изменений
+    не тратят лимиты Telegram. После временной ошибки доска ждёт
+    повтора с экспоненциально растущей паузой, а после постоянной
+    (бот заблокирован, чата нет) забывает сообщение, но хранит статусы.
+    Текст длиннее одного сообщения Telegram обрезается.
+    """
+
+    def __init__(self, verdicts, bot_for, debounce=DEBOUNCE, saved=None,
+                 heartbeat=None):
+        """Восстанавливает доски из `saved` и помечает изменённые.
+
+        `heartbeat` вызывается на каждом проходе и после каждой доски.
+        """
+        self.verdicts = verdicts
+        self.bot_for = bot_for
+        self.debounce = debounce
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.boards = {chat_id: Board(**board)
+                       for chat_id, board in (saved or {}).items()}
+        for board in self.boards.values():
+            if self.render(board) != board.rendered:
+                board.changed_at = 0.0
+        self.stopped = threading.Event()
+
+    def update(self, subscription, homework, message=None):
+        """Запоминает новый статус работы в доске чата подписки."""
+        with self.lock:
+            board = self.boards.setdefault(subscription.chat_id, Board())
+            name = homework['homework_name']
+            if board.statuses.get(name) != homework['status']:
+                board.statuses[name] = homework['status']
+                board.changed_at = time.monotonic()
+
+    def render(self, board):
+        """Текст доски по текущим статусам.
+
+        Если доска не помещается в одно сообщение Telegram, выводятся
+        первые работы и число оставшихся.
+        """
+        lines = [BOARD_LINE.format(name=name, verdict=self.verdicts[status])
+                 for name, status in sorted(board.statuses.items())]
+        text = '\n'.join([BOARD_TITLE] + lines)
+        if len(text) <= MAX_LENGTH:
+            return text
+        limit = MAX_LENGTH - len(BOARD_MORE.format(count=len(lines))) - 1
+        shown = [BOARD_TITLE]
+        length = len(BOARD_TITLE)
+        for line in lines:
+            if length + 1 + len(line) > limit:
+                break
+            shown.append(line)
+            length += 1 + len(line)
+        return '\n'.join(shown + [BOARD_MORE.format(
+            count=len(lines) - len(shown) + 1)])
+
+    def due(self, force=False):
+        """Доски, изменения которых пора выводить."""
+        now = time.monotonic()
+        with self.lock:
+            return [(chat_id, board, self.render(board), board.changed_at)
+                    for chat_id, board in self.boards.items()
+                    if board.changed_at is not None and (force or (
+                        now - board.changed_at >= self.debounce
+                        and now >= board.retry_at))]
+
+    def publish(self, chat_id, board, text):
+        """Создаёт или правит сообщение доски."""
+        bot = self.bot_for(chat_id)
+        if board.message_id is not None:
+            try:
+                bot.edit_message_text(
+                    chat_id=chat_id, message_id=board.message_id, text=text)
+                logging.debug(BOARD_EDITED.format(chat_id=chat_id))
+                return
+            except telegram.error.BadRequest as error:
+                if NOT_MODIFIED in str(error).lower():
+                    return
+                if NOT_FOUND not in str(error).lower():
+                    raise
+        message = bot.send_message(chat_id=chat_id, text=text)
+        board.message_id = message.message_id
+        logging.info(BOARD_CREATED.format(chat_id=chat_id))
+        try:
+            bot.pin_chat_message(chat_id=chat_id,
+                                 message_id=message.message_id,
+                                 disable_notification=True)
+        except telegram.error.TelegramError as error:
+            logging.warning(BOARD_PIN_ERROR.format(
+                chat_id=chat_id, error=error))
+
+    def flush(self, force=False):
+        """Выводит накопившиеся изменения досок."""
+        with self.flushing:
+            self.flush_due(force)
+
+    def flush_due(self, force):
+        """Тело flush: по одной правке на каждую готовую доску."""
+        for chat_id, board, text, changed_at in self.due(force):
+            if self.heartbeat:
+                self.heartbeat()
+            try:
+                if text != board.rendered:
+                    self.publish(chat_id, board, text)
+            except Exception as error:
+                logging.error(BOARD_ERROR.format(
+                    chat_id=chat_id, error=error))
+                self.failed(chat_id, board, error)
+                continue
+            with self.lock:
+                board.failures = 0
+                board.retry_at = 0.0
+                board.rendered = text
+                if board.changed_at == changed_at:
+                    board.changed_at = None
+
+    def failed(self, chat_id, board, error):
+        """Откладывает повтор доски после ошибки вывода.
+
+        После постоянной ошибки статусы доски сохраняются, а сообщение
+        забывается: при следующем изменении доска будет создана заново.
+        """
+        with self.lock:
+            if is_permanent(error):
+                board.message_id = board.rendered = board.changed_at = None
+                board.failures = 0
+                board.retry_at = 0.0
+                logging.error(BOARD_DROPPED.format(
+                    chat_id=chat_id, error=error))
+                return
+            board.failures += 1
+            delay = min(RETRY_BASE * 2 ** (board.failures - 1), RETRY_MAX)
+            board.retry_at = time.monotonic() + delay
+        logging.warning(BOARD_RETRY.format(chat_id=chat_id, seconds=delay))
+
+    def snapshot(self):
+        """Состояние всех досок для сохранения на диск."""
+        with self.lock:
+            return {chat_id: board.snapshot()
+                    for chat_id, board in self.boards.items()}
+
+    def run(self):
+        """Цикл фонового потока: выводит изменения по мере готовности."""
+        while not self.stopped.wait(FLUSH_PERIOD):
+            if self.heartbeat:
+                self.heartbeat()
+            self.flush()
+
+    def start(self):
+        """Запускает фоновый поток вывода."""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Останавливает поток и выводит всё, что накопилось."""
+        self.stopped.set()
+        self.flush(force=True)
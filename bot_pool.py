@@ -0,0 +1,273 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import telegram
+
+from exceptions import BotRevoked
+
+
+REPLICAS = 100
+MAX_RATE = 30
+MAX_THROTTLE_WAIT = 5
+
+BOT_ADDED = 'Бот {bot} добавлен в пул, ботов: {count}'
+BOT_REMOVED = 'Бот {bot} удалён из пула, ботов: {count}'
+BOT_REVOKED = 'Токен бота {bot} отозван, бот выведен из пула'
+BOT_THROTTLED = 'Бот {bot} ограничен Telegram на {seconds} с'
+BOT_STATS = ('Бот {bot}: отправлено {sent}, ошибок {failed}, '
+             'ограничений {throttled}, {rate:.2f} сообщ./с')
+FORBIDDEN = 'forbidden'
+CHAT_NOT_FOUND = 'chat not found'
+
+
+def stable_hash(value):
+    """Хеш, одинаковый между запусками, в отличие от hash()."""
+    return int.from_bytes(
+        hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+
+def is_permanent(error):
+    """Не пройдёт ли отправка в этот чат и при повторе.
+
+    Постоянными считаются только ошибки самого чата: бот заблокирован
+    или исключён (403 Forbidden) и чата нет. python-telegram-bot 13
+    бросает Unauthorized и на 403, и на 401; 401 означает отозванный
+    токен бота (см. is_revoked), и к чату отношения не имеет. Сетевые
+    ошибки, таймауты и RetryAfter временные.
+    """
+    text = str(error).lower()
+    if isinstance(error, telegram.error.Unauthorized):
+        return FORBIDDEN in text
+    return (isinstance(error, telegram.error.BadRequest)
+            and CHAT_NOT_FOUND in text)
+
+
+def is_revoked(error):
+    """Отозван ли токен бота (401 или 404 от Bot API)."""
+    return (isinstance(error, telegram.error.InvalidToken)
+            or isinstance(error, telegram.error.Unauthorized)
+            and not is_permanent(error))
+
+
+def bot_id(token):
+    """Публичная часть токена бота, которую можно писать в лог."""
+    return token.split(':', 1)[0]
+
+
+class PooledBot:
+    """Бот из пула: соблюдает лимиты Telegram и считает отправки.
+
+    Снаружи выглядит как telegram.Bot, поэтому передаётся в
+    send_message без изменений.
+    """
+
+    def __init__(self, token, bot, max_rate=MAX_RATE):
+        """Оборачивает `bot` с лимитом `max_rate` сообщений в секунду."""
+        self.id = bot_id(token)
+        self.bot = bot
+        self.interval = 1 / max_rate
+        self.lock = threading.Lock()
+        self.next_send = 0.0
+        self.throttled_until = 0.0
+        self.sent = self.failed = self.throttled = 0
+        self.revoked = False
+        self.reported_sent = 0
+        self.reported_at = time.monotonic()
+
+    def __getattr__(self, name):
+        """Остальные методы берутся у исходного бота."""
+        return getattr(self.bot, name)
+
+    def wait_turn(self):
+        """Выдерживает интервал между отправками и паузу после 429."""
+        with self.lock:
+            now = time.monotonic()
+            remaining = self.throttled_until - now
+            if remaining > MAX_THROTTLE_WAIT:
+                raise telegram.error.RetryAfter(remaining)
+            start = max(now, self.next_send, self.throttled_until)
+            self.next_send = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def call(self, method, *args, **kwargs):
+        """Вызывает метод Bot API с учётом лимитов этого бота."""
+        self.wait_turn()
+        try:
+            result = getattr(self.bot, method)(*args, **kwargs)
+        except telegram.error.RetryAfter as error:
+            with self.lock:
+                self.throttled += 1
+                self.failed += 1
+                self.throttled_until = time.monotonic() + error.retry_after
+            logging.warning(BOT_THROTTLED.format(
+                bot=self.id, seconds=error.retry_after))
+            raise
+        except Exception:
+            with self.lock:
+                self.failed += 1
+            raise
+        with self.lock:
+            self.sent += 1
+        return result
+
+    def send_message(self, *args, **kwargs):
+        """Отправляет сообщение."""
+        return self.call('send_message', *args, **kwargs)
+
+    def edit_message_text(self, *args, **kwargs):
+        """Редактирует сообщение."""
+        return self.call('edit_message_text', *args, **kwargs)
+
+    def pin_chat_message(self, *args, **kwargs):
+        """Закрепляет сообщение в чате."""
+        return self.call('pin_chat_message', *args, **kwargs)
+
+    def report(self):
+        """Пишет в лог статистику бота с прошлого отчёта."""
+        with self.lock:
+            now = time.monotonic()
+            rate = (self.sent - self.reported_sent) / max(
+                now - self.reported_at, 1e-9)
+            self.reported_sent, self.reported_at = self.sent, now
+            logging.info(BOT_STATS.format(
+                bot=self.id, sent=self.sent, failed=self.failed,
+                throttled=self.throttled, rate=rate))
+
+
+def create_bot(token, base_url=None):
+    """Создаёт бота, при необходимости с другим адресом Bot API."""
+    if base_url:
+        return telegram.Bot(token=token, base_url=base_url)
+    return telegram.Bot(token=token)
+
+
+class BotPool:
+    """Пул ботов, между которыми чаты распределены согласованным хешем.
+
+    Каждый бот занимает на кольце `replicas` точек, чат обслуживает
+    ближайший по часовой стрелке бот. При добавлении или удалении бота
+    переезжает лишь доля чатов, которая приходится на этого бота.
+    """
+
+    def __init__(self, replicas=REPLICAS, base_url=None):
+        """Пустой пул; у каждого бота `replicas` точек на кольце."""
+        self.replicas = replicas
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.bots = {}
+        self.revoked = set()
+        self.ring = []
+        self.points = []
+
+    def rebuild(self):
+        """Пересчитывает кольцо после изменения состава пула."""
+        self.ring = sorted(
+            (stable_hash(f'{token_id}:{replica}'), token_id)
+            for token_id in self.bots for replica in range(self.replicas))
+        self.points = [point for point, _ in self.ring]
+
+    def add(self, token, bot=None):
+        """Добавляет бота в пул."""
+        pooled = PooledBot(token, bot or create_bot(token, self.base_url))
+        with self.lock:
+            self.bots[pooled.id] = pooled
+            self.rebuild()
+        logging.info(BOT_ADDED.format(bot=pooled.id, count=len(self.bots)))
+        return pooled
+
+    def remove(self, token):
+        """Удаляет бота; его чаты переходят к соседям по кольцу."""
+        with self.lock:
+            self.bots.pop(bot_id(token), None)
+            self.rebuild()
+        logging.info(BOT_REMOVED.format(bot=bot_id(token),
+                                        count=len(self.bots)))
+
+    def revoke(self, bot):
+        """Выводит из пула бота с отозванным токеном.
+
+        Его чаты переходят к остальным ботам; токен больше не
+        добавляется при `sync`. Последний бот остаётся в пуле, чтобы
+        чатам было куда отправлять, когда токен вернут.
+        """
+        with self.lock:
+            if bot.revoked:
+                return
+            bot.revoked = True
+            self.revoked.add(bot.id)
+            if len(self.bots) > 1:
+                self.bots.pop(bot.id, None)
+                self.rebuild()
+        logging.error(BOT_REVOKED.format(bot=bot.id))
+
+    def sync(self, tokens):
+        """Приводит состав пула к списку токенов."""
+        wanted = {bot_id(token): token for token in tokens
+                  if bot_id(token) not in self.revoked} or {
+            bot_id(token): token for token in tokens}
+        for token_id in set(self.bots) - set(wanted):
+            self.remove(token_id)
+        for token_id in set(wanted) - set(self.bots):
+            self.add(wanted[token_id])
+
+    def bot_for(self, chat_id):
+        """Бот, который обслуживает чат."""
+        with self.lock:
+            index = bisect.bisect(self.points, stable_hash(chat_id))
+            return self.bots[self.ring[index % len(self.ring)][1]]
+
+    def bot_for_token(self, token):
+        """Бот пула с этим токеном."""
+        with self.lock:
+            return self.bots[bot_id(token)]
+
+    def drain(self, outbox, send, progress=None):
+        """Разбирает outbox параллельно: у каждого бота свой поток.
+
+        Чат всегда обслуживает один бот, поэтому порядок сообщений в чате
+        сохраняется, а общая пропускная способность растёт с числом ботов.
+        `progress` вызывается после каждой попытки отправки. Если токен
+        бота отозван, бот выводится из пула, а его уведомления остаются
+        в очереди и в следующий раз уйдут через других ботов.
+        """
+        queues = defaultdict(list)
+        for notification in outbox.queue():
+            queues[self.bot_for(notification.chat_id)].append(notification)
+
+        def attempt(bot, notification):
+            if bot.revoked:
+                return None
+            try:
+                return send(bot, notification)
+            except BotRevoked:
+                self.revoke(bot)
+                return None
+            finally:
+                if progress:
+                    progress()
+
+        def deliver(bot, queue):
+            return outbox.deliver(
+                queue, lambda notification: attempt(bot, notification))
+
+        executor = ThreadPoolExecutor(max_workers=max(len(queues), 1))
+        try:
+            sent = sum(executor.map(deliver, queues, queues.values()))
+        finally:
+            # Если разбор прерван сроком остановки, потоки ботов не ждём.
+            executor.shutdown(wait=False, cancel_futures=True)
+        outbox.commit()
+        return sent
+
+    def report(self):
+        """Статистика по всем ботам пула."""
+        with self.lock:
+            bots = list(self.bots.values())
+        for bot in bots:
+            bot.report()
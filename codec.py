@@ -0,0 +1,57 @@
+import importlib
+import json
+import logging
+
+
+AUTO = 'auto'
+STDLIB = 'json'
+FAST_DECODERS = ('orjson', 'ujson')
+
+CODEC_SELECTED = 'Ответы API декодирует {name}'
+CODEC_MISSING = 'Декодер {name} не установлен, используется {fallback}'
+
+
+def available():
+    """Установленные декодеры от самого быстрого; stdlib json последний.
+
+    Все они принимают байты ответа напрямую, без промежуточной строки.
+    """
+    decoders = {}
+    for name in FAST_DECODERS:
+        try:
+            decoders[name] = importlib.import_module(name).loads
+        except ImportError:
+            continue
+    decoders[STDLIB] = json.loads
+    return decoders
+
+
+class ResponseCodec:
+    """Декодирует тело ответа API выбранным декодером.
+
+    `name` — имя декодера или `auto` для самого быстрого из
+    установленных. Неустановленный декодер заменяется stdlib json.
+    """
+
+    def __init__(self, name=AUTO):
+        """Выбирает декодер по имени `name`."""
+        decoders = available()
+        if name == AUTO:
+            name = next(iter(decoders))
+        elif name not in decoders:
+            logging.warning(CODEC_MISSING.format(name=name, fallback=STDLIB))
+            name = STDLIB
+        self.name = name
+        self.loads = decoders[name]
+        logging.debug(CODEC_SELECTED.format(name=name))
+
+    def decode(self, response):
+        """JSON из сырых байтов ответа.
+
+        Объекты без байтового тела (например, подставные ответы)
+        декодируются их собственным методом json().
+        """
+        content = getattr(response, 'content', None)
+        if not isinstance(content, (bytes, bytearray)):
+            return response.json()
+        return self.loads(content)
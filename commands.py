@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import telegram
+
+
+STALE_AFTER = 1800
+LONG_POLL_TIMEOUT = 30
+UPDATES_LIMIT = 100
+ERROR_PAUSE = 5
+STANDBY_PAUSE = 5
+
+STATUS_HEADER = 'Подписка «{name}»: проверено {age} назад.'
+STATUS_NEVER = 'Подписка «{name}»: API ещё не опрашивался.'
+STATUS_STALE = ('Внимание: данные устарели, последний успешный опрос '
+                'был больше {threshold} назад.')
+STATUS_COUNT = '{verdict}: {count}'
+STATUS_EMPTY = 'Изменений статусов с момента запуска не было.'
+HOMEWORK_LINE = '• {name}: {verdict} ({updated})'
+NOT_SUBSCRIBED = 'Этот чат не подписан на уведомления о статусах работ.'
+UNKNOWN_COMMAND = 'Команды: /status — сводка, /homeworks — список работ.'
+COMMANDS_BATCH = 'Обработано обновлений {updates}, ответов {replies}'
+COMMANDS_ERROR = 'Не удалось получить обновления Telegram: {error}'
+REPLY_ERROR = 'Не удалось ответить в чат {chat_id}: {error}'
+
+CachedStatus = namedtuple('CachedStatus', ('checked_at', 'homeworks'))
+
+
+def format_age(seconds):
+    """Давность в минутах или часах для ответа пользователю."""
+    if seconds < 3600:
+        return f'{max(int(seconds // 60), 1)} мин'
+    return f'{seconds / 3600:.1f} ч'
+
+
+class StatusCache:
+    """Последние результаты check_response по подпискам.
+
+    Кэш заполняется из цикла опроса и хранит для каждой подписки время
+    последнего успешного ответа API и последние известные статусы
+    работ. Команды отвечают только из него и не обращаются к API.
+    """
+
+    def __init__(self, verdicts, stale_after=STALE_AFTER, saved=None):
+        """Кэш с порогом устаревания `stale_after` секунд."""
+        self.verdicts = verdicts
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        self.chats = {}
+        self.entries = {}
+        for name, entry in (saved or {}).items():
+            self.entries[name] = CachedStatus(*entry)
+
+    def observe(self, subscription, homeworks):
+        """Запоминает успешный ответ API для подписки."""
+        with self.lock:
+            entry = self.entries.get(subscription.name)
+            statuses = dict(entry.homeworks) if entry else {}
+            for homework in homeworks:
+                statuses[homework['homework_name']] = [
+                    homework['status'], homework.get('date_updated')]
+            self.entries[subscription.name] = CachedStatus(
+                time.time(), statuses)
+            self.chats.setdefault(str(subscription.chat_id), set()).add(
+                subscription.name)
+
+    def merge(self, saved):
+        """Добавляет записи других узлов, если они новее своих."""
+        with self.lock:
+            for name, entry in saved.items():
+                current = self.entries.get(name)
+                if current is None or current.checked_at < entry[0]:
+                    self.entries[name] = CachedStatus(*entry)
+
+    def register(self, subscriptions):
+        """Обновляет соответствие чатов подпискам."""
+        chats = {}
+        for subscription in subscriptions:
+            chats.setdefault(str(subscription.chat_id), set()).add(
+                subscription.name)
+        with self.lock:
+            self.chats = chats
+
+    def lookup(self, chat_id):
+        """Записи кэша для подписок чата."""
+        with self.lock:
+            return {name: self.entries.get(name)
+                    for name in sorted(self.chats.get(str(chat_id), ()))}
+
+    def freshness(self, name, entry, now):
+        """Строки о давности данных подписки."""
+        if entry is None:
+            return [STATUS_NEVER.format(name=name)]
+        age = now - entry.checked_at
+        lines = [STATUS_HEADER.format(name=name, age=format_age(age))]
+        if age > self.stale_after:
+            lines.append(STATUS_STALE.format(
+                threshold=format_age(self.stale_after)))
+        return lines
+
+    def status(self, chat_id, now=None):
+        """Ответ на /status: давность данных и число работ по статусам."""
+        now = time.time() if now is None else now
+        entries = self.lookup(chat_id)
+        if not entries:
+            return NOT_SUBSCRIBED
+        lines = []
+        for name, entry in entries.items():
+            lines += self.freshness(name, entry, now)
+            counts = {}
+            for status, _ in (entry.homeworks.values() if entry else ()):
+                counts[status] = counts.get(status, 0) + 1
+            lines += [STATUS_COUNT.format(verdict=self.verdicts.get(
+                status, status), count=count)
+                for status, count in sorted(counts.items())]
+            if entry and not counts:
+                lines.append(STATUS_EMPTY)
+        return '\n'.join(lines)
+
+    def homeworks(self, chat_id, now=None):
+        """Ответ на /homeworks: последние статусы всех работ."""
+        now = time.time() if now is None else now
+        entries = self.lookup(chat_id)
+        if not entries:
+            return NOT_SUBSCRIBED
+        lines = []
+        for name, entry in entries.items():
+            lines += self.freshness(name, entry, now)
+            lines += [HOMEWORK_LINE.format(
+                name=homework, verdict=self.verdicts.get(status, status),
+                updated=updated or '—')
+                for homework, (status, updated)
+                in sorted(entry.homeworks.items() if entry else ())]
+        return '\n'.join(lines)
+
+    def snapshot(self):
+        """Состояние кэша для сохранения на диск."""
+        with self.lock:
+            return {name: list(entry)
+                    for name, entry in self.entries.items()}
+
+
+class CommandServer(threading.Thread):
+    """Отвечает на команды из кэша, получая обновления long polling.
+
+    Обновления забираются пачками до `UPDATES_LIMIT` штук; смещение
+    подтверждает обработанные, а повторы одной команды из чата в пачке
+    получают один ответ. API Практикума при этом не запрашивается.
+
+    Если задана проверка `active`, обновления забираются, только пока
+    она истинна: при нескольких узлах getUpdates на одном токене
+    должен вызывать ровно один из них, иначе Telegram отвечает 409.
+    """
+
+    def __init__(self, bot, cache, timeout=LONG_POLL_TIMEOUT,
+                 heartbeat=None, active=None):
+        """Готовит поток ответов на команды боту `bot`.
+
+        `heartbeat` вызывается перед каждым запросом обновлений.
+        """
+        super().__init__(daemon=True)
+        self.bot = bot
+        self.cache = cache
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.active = active
+        self.offset = None
+        self.stopped = threading.Event()
+        self.handlers = {'/status': cache.status,
+                         '/homeworks': cache.homeworks,
+                         '/start': cache.status}
+
+    def replies(self, updates):
+        """Ответы на пачку обновлений: по одному на чат и команду."""
+        replies = {}
+        for update in updates:
+            message = update.message
+            if message is None or not (message.text or '').startswith('/'):
+                continue
+            command = message.text.split()[0].split('@')[0].lower()
+            replies[message.chat_id, command] = self.handlers.get(
+                command, lambda chat_id: UNKNOWN_COMMAND)
+        return [(chat_id, handler(chat_id))
+                for (chat_id, _), handler in replies.items()]
+
+    def poll(self):
+        """Обрабатывает одну пачку обновлений."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout, limit=UPDATES_LIMIT,
+            allowed_updates=['message'])
+        if not updates:
+            return 0
+        self.offset = updates[-1].update_id + 1
+        replies = self.replies(updates)
+        for chat_id, text in replies:
+            try:
+                self.bot.send_message(chat_id=chat_id, text=text)
+            except telegram.error.TelegramError as error:
+                logging.warning(REPLY_ERROR.format(
+                    chat_id=chat_id, error=error))
+        logging.debug(COMMANDS_BATCH.format(
+            updates=len(updates), replies=len(replies)))
+        return len(updates)
+
+    def run(self):
+        """Забирает обновления, пока не остановлен."""
+        while not self.stopped.is_set():
+            if self.heartbeat:
+                self.heartbeat()
+            if self.active and not self.active():
+                self.offset = None
+                self.stopped.wait(STANDBY_PAUSE)
+                continue
+            try:
+                self.poll()
+            except telegram.error.TelegramError as error:
+                logging.error(COMMANDS_ERROR.format(error=error))
+                self.stopped.wait(ERROR_PAUSE)
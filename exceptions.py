@@ -1,8 +1,50 @@
 class StatusCodeError(Exception):
     """Код запроса отличается от 200."""
+
     pass
 
 
 class ResponseError(Exception):
     """Отказ от обслуживания."""
+
+    pass
+
+
+class ShutdownRequested(BaseException):
+    """Получен сигнал остановки во время ожидания.
+
+    Наследуется от BaseException, чтобы его не перехватывали
+    обработчики ошибок опроса.
+    """
+
+    pass
+
+
+class ShutdownDeadline(BaseException):
+    """Истекло время на завершение текущих запросов при остановке."""
+
+    pass
+
+
+class CallAbandoned(TimeoutError):
+    """Вызов не уложился в срок сторожа и брошен."""
+
+    pass
+
+
+class Undeliverable(Exception):
+    """Уведомление не может быть доставлено ни при какой попытке."""
+
+    pass
+
+
+class BotRevoked(Exception):
+    """Токен бота отозван: отправлять через этого бота нельзя."""
+
+    pass
+
+
+class ReplayedError(Exception):
+    """Ошибка API, повторённая из записи трафика."""
+
     pass
@@ -1,23 +1,93 @@
+import contextvars
+import functools
+import hashlib
+import json
 import logging
 import os
+import signal
+import socket
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 import requests
 import telegram
 
-from exceptions import StatusCodeError, ResponseError
+from analytics import ReviewAnalytics
+from backpressure import Backpressure
+from board import FLUSH_PERIOD, BoardManager
+from bot_pool import BotPool, bot_id, is_permanent, is_revoked
+from codec import ResponseCodec
+from commands import LONG_POLL_TIMEOUT, CommandServer, StatusCache
+from exceptions import (BotRevoked, ResponseError, ShutdownDeadline,
+                        ShutdownRequested, StatusCodeError, Undeliverable)
+from latency import AdaptiveClient
+from leases import LeaseKeeper, LeaseManager
+from liveness import Watchdog
+from outbox import Outbox
+from profiling import Profiler
+from schema import Validator, field
+from shutdown import GracefulShutdown
+from state import load_json, load_state, save_state
+from subscriptions import (CONFIG_CHECK_PERIOD, Config, ConfigWatcher,
+                           Subscription, SubscriptionRegistry)
+from tokens import TokenCheck, TokenValidator
+from traffic import TrafficRecorder
 
 
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+TELEGRAM_TOKENS = [token for token in os.getenv(
+    'TELEGRAM_TOKENS', '').split(',') if token]
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+STATE_FILE = os.getenv('STATE_FILE')
+OUTBOX_PATH = os.getenv('OUTBOX_PATH')
+QUEUE_CAPACITY = int(os.getenv('QUEUE_CAPACITY', 10000))
+BOARD_MODE = os.getenv('BOARD_MODE')
+BOARD_FILE = os.getenv('BOARD_FILE')
+BOARD_FLUSH_DEADLINE = 5
+OUTBOX_DRAIN_DEADLINE = 10
+BOT_COMMANDS = os.getenv('BOT_COMMANDS')
+STATUS_CACHE_FILE = os.getenv('STATUS_CACHE_FILE')
+COMMANDS_ROLE = 'commands'
+DIGEST_ROLE = 'digests'
+STALE_AFTER = int(os.getenv('STALE_AFTER', 1800))
+ANALYTICS = os.getenv('ANALYTICS')
+ANALYTICS_FILE = os.getenv('ANALYTICS_FILE')
+DIGEST_PERIOD = int(os.getenv('DIGEST_PERIOD', 24 * 3600))
+DIGEST_ONLY = os.getenv('DIGEST_ONLY')
+POLL_WORKERS = int(os.getenv('POLL_WORKERS', 1))
+LEASE_DB = os.getenv('LEASE_DB')
+VALIDATE_TOKENS = os.getenv('VALIDATE_TOKENS')
+NODE_ID = os.getenv('NODE_ID') or os.getenv(
+    'DYNO', f'{socket.gethostname()}:{os.getpid()}')
 
 RETRY_PERIOD = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+JSON_CODEC = os.getenv('JSON_CODEC', 'auto')
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS')
+HEDGE_BUDGET = float(os.getenv('HEDGE_BUDGET', 0.05))
+TRAFFIC_CAPTURE = os.getenv('TRAFFIC_CAPTURE')
+PROFILE = os.getenv('PROFILE')
+PROFILE_OUTPUT = os.getenv('PROFILE_OUTPUT')
+WATCHDOG = os.getenv('WATCHDOG')
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', 0))
+WATCHDOG_GRACE = 300
+WATCHED_CALLS = {'get_api_answer': 120, 'send_message': 60}
+POLL_LOOP = 'poll:{}'
+POLL_WITHIN = WATCHDOG_GRACE + sum(WATCHED_CALLS.values())
+ABANDONED_RESULTS = {'send_message': False}
+PROFILED_FUNCTIONS = ('get_api_answer', 'check_response', 'parse_status',
+                      'send_message')
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_VERDICTS = {
@@ -26,10 +96,31 @@ HOMEWORK_VERDICTS = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
+HOMEWORK_SCHEMA = field(dict, fields={
+    'homework_name': field(str),
+    'status': field(str, choices=HOMEWORK_VERDICTS),
+})
+RESPONSE_SCHEMA = field(dict, fields={
+    'homeworks': field(list, items=HOMEWORK_SCHEMA),
+    'current_date': field(int, required=False),
+})
+HOMEWORK_VALIDATOR = Validator(HOMEWORK_SCHEMA, 'homework')
+RESPONSE_VALIDATOR = Validator(RESPONSE_SCHEMA, 'response')
+
 TOKENS = ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID')
+CONFIG_TOKENS = ('TELEGRAM_TOKEN',)
+
+API_CLIENT = AdaptiveClient(hedge=bool(HEDGE_REQUESTS), budget=HEDGE_BUDGET)
+CODEC = ResponseCodec(JSON_CODEC)
+
+SUBSCRIPTION = contextvars.ContextVar('subscription', default=None)
+CHAT_ID = contextvars.ContextVar('chat_id', default=None)
+SEND_ERRORS = contextvars.ContextVar('send_errors', default=None)
+VALIDATED = contextvars.ContextVar('validated', default=False)
 
 SEND_MESSAGE_INFO = 'Сообщение отправлено: "{}"'
 NOT_SENT_MESSAGE_INFO = 'Сообщение "{}" не отправлено: "{}"'
+CHAT_MIGRATED = 'Чат {old} стал супергруппой {new}, отправляем туда'
 API_INFO = 'Делаем запрос к API Практикума.'
 API_ERROR = ('Ошибка подключения к API: {error}.'
              'endpoint: {url}, headers: {headers}, params: {params}')
@@ -37,31 +128,54 @@ STATUS_CODE_ERROR = ('Неверный ответ сервера {status_code}.'
                      'endpoint: {url}, headers: {headers}, params: {params}')
 RESPONSE_ERROR = ('Отказ от обслуживания: {error}, key {key}. '
                   'endpoint: {url}, headers: {headers}, params: {params}')
-RESPONSE_NOT_DICT = 'В ответе API не словарь, а {}'
-HOMEWORKS_KEY_NOT_FOUND = 'Ключа "homeworks" в словаре нет'
-HOMEWORKS_NOT_LIST = ('Под ключом "homeworks"'
-                      'домашка приходит не в виде списка, а {}')
-HOMEWORK_NAME_NOT_FOUND = 'Не найден ключ "homework_name"!'
-UNKNOWN_STATUS = 'Неизвестный статус: {}'
 STATUS_CHANGED = 'Изменился статус проверки работы "{name}". {verdict}'
 ERROR_MESSAGE = 'Сбой в работе программы: {}'
 CRITIKAL_ERROR = 'Отсутсвует или некорректна переменная: {token}'
 CHECK_INFO = 'Начало проверки на корректность'
 PARSE_INFO = 'Извлекаем информацию о конкретной домашней работе'
 TOKEN_ERROR = 'Отсутствуют переменные окружения'
+PROGRESS_WITHOUT_OUTBOX = ('STATE_FILE и LEASE_DB сохраняют метки времени, '
+                           'поэтому требуют OUTBOX_PATH: иначе уведомления, '
+                           'не отправленные до остановки, потеряются')
+SHUTDOWN_INFO = 'Бот остановлен'
+STATUSES_SHARE_ERROR = 'Не удалось обменяться статусами с узлами: {error}'
+ANALYTICS_SHARE_ERROR = ('Не удалось свести статистику проверок '
+                         'с узлами: {error}')
+
+
+def get_headers():
+    """Заголовки запроса для текущей подписки."""
+    subscription = SUBSCRIPTION.get()
+    if subscription is None:
+        return HEADERS
+    return {'Authorization': f'OAuth {subscription.practicum_token}'}
+
+
+def get_chat_id():
+    """Чат текущей подписки."""
+    chat_id = CHAT_ID.get()
+    if chat_id is not None:
+        return chat_id
+    subscription = SUBSCRIPTION.get()
+    if subscription is None:
+        return TELEGRAM_CHAT_ID
+    return subscription.chat_id
 
 
 def send_message(bot, message):
     """Отправка сообщения об изменении статуса."""
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+            chat_id=get_chat_id(),
             text=message,
         )
         logging.debug(SEND_MESSAGE_INFO.format(message))
         return True
     except Exception as error:
         logging.exception(NOT_SENT_MESSAGE_INFO.format(message, error))
+        errors = SEND_ERRORS.get()
+        if errors is not None:
+            errors.append(error)
         return False
 
 
@@ -70,11 +184,11 @@ def get_api_answer(timestamp):
     logging.info(API_INFO)
     parameters = dict(
         url=ENDPOINT,
-        headers=HEADERS,
+        headers=get_headers(),
         params={'from_date': timestamp}
     )
     try:
-        response = requests.get(**parameters)
+        response = API_CLIENT.get(**parameters)
     except requests.exceptions.RequestException as error:
         raise ConnectionError(API_ERROR.format(error=error,
                                                **parameters))
@@ -82,7 +196,7 @@ def get_api_answer(timestamp):
     if status_code != 200:
         raise StatusCodeError(STATUS_CODE_ERROR.format(status_code=status_code,
                                                        **parameters))
-    response_json = response.json()
+    response_json = CODEC.decode(response)
     for key in ('error', 'code'):
         if key in response_json:
             raise ResponseError(RESPONSE_ERROR.format(
@@ -95,57 +209,531 @@ def get_api_answer(timestamp):
 def check_response(response):
     """Проверяет ответ API на корректность."""
     logging.info(CHECK_INFO)
-    if not isinstance(response, dict):
-        raise TypeError(RESPONSE_NOT_DICT.format(type(response)))
-    if 'homeworks' not in response:
-        raise KeyError(HOMEWORKS_KEY_NOT_FOUND)
-    homeworks = response['homeworks']
-    if not isinstance(homeworks, list):
-        raise TypeError(HOMEWORKS_NOT_LIST.format(type(homeworks)))
-    return homeworks
+    return RESPONSE_VALIDATOR.validate(response)['homeworks']
 
 
 def parse_status(homework):
-    """Извлекаем информацию о конкретной домашней работе."""
+    """Извлекаем информацию о конкретной домашней работе.
+
+    Работы ответа, уже проверенного check_response при опросе,
+    повторно не проверяются.
+    """
     logging.info(PARSE_INFO)
-    status = homework['status']
-    if status not in HOMEWORK_VERDICTS:
-        raise ValueError(UNKNOWN_STATUS.format(status))
-    if 'homework_name' not in homework:
-        raise KeyError(HOMEWORK_NAME_NOT_FOUND)
+    if not VALIDATED.get():
+        HOMEWORK_VALIDATOR.validate(homework)
     return STATUS_CHANGED.format(
         name=homework['homework_name'],
-        verdict=HOMEWORK_VERDICTS[status])
+        verdict=HOMEWORK_VERDICTS[homework['status']])
 
 
 def check_tokens():
     """Проверка наличия токенов."""
-    token_list = [name for name in TOKENS if globals()[name] is None]
+    tokens = CONFIG_TOKENS if SUBSCRIPTIONS_FILE else TOKENS
+    token_list = [name for name in tokens if globals()[name] is None]
     if token_list:
         logging.critical(CRITIKAL_ERROR.format(token=token_list))
         return False
     return True
 
 
+def check_config():
+    """Проверка сочетания настроек."""
+    if (STATE_FILE or LEASE_DB) and not OUTBOX_PATH:
+        logging.critical(PROGRESS_WITHOUT_OUTBOX)
+        return False
+    return True
+
+
+def notification_key(chat_id, homework):
+    """Ключ идемпотентности уведомления о смене статуса."""
+    identity = [chat_id] + [homework.get(key) for key in (
+        'id', 'homework_name', 'status', 'date_updated')]
+    return hashlib.sha1(
+        json.dumps(identity, ensure_ascii=False).encode()).hexdigest()
+
+
+def send_to(bot, chat_id, text):
+    """Отправляет текст в чат через send_message.
+
+    Возвращает, удалась ли отправка, и последнюю ошибку Telegram.
+    """
+    errors = []
+    chat = CHAT_ID.set(chat_id)
+    collected = SEND_ERRORS.set(errors)
+    try:
+        sent = send_message(bot, text)
+    finally:
+        SEND_ERRORS.reset(collected)
+        CHAT_ID.reset(chat)
+    return sent, errors[-1] if errors else None
+
+
+def deliver(bot, notification):
+    """Отправляет уведомление из outbox в его чат.
+
+    Если группа стала супергруппой, уведомление отправляется в новый
+    чат. Если токен бота отозван, бросает BotRevoked: пул выводит бота,
+    а уведомление остаётся в очереди. Если Telegram ответил ошибкой
+    самого чата, которая не пройдёт и при повторе (бот заблокирован,
+    чата нет), бросает Undeliverable, и outbox снимает уведомление
+    с очереди. Иначе ошибка временная, и уведомление ждёт повтора.
+    """
+    sent, error = send_to(bot, notification.chat_id, notification.text)
+    if not sent and isinstance(error, telegram.error.ChatMigrated):
+        logging.warning(CHAT_MIGRATED.format(
+            old=notification.chat_id, new=error.new_chat_id))
+        sent, error = send_to(bot, error.new_chat_id, notification.text)
+    if sent:
+        return True
+    if is_revoked(error):
+        raise BotRevoked(error)
+    if is_permanent(error):
+        raise Undeliverable(error)
+    return False
+
+
+def enqueue(outbox, subscription, homework, message):
+    """Ставит уведомление о смене статуса в outbox."""
+    outbox.put(notification_key(subscription.chat_id, homework),
+               subscription.chat_id, message)
+
+
+def fan_out(sinks):
+    """Передаёт смену статуса всем получателям по очереди."""
+    def notify(subscription, homework, message):
+        for sink in sinks:
+            sink(subscription, homework, message)
+    return notify
+
+
+def poll_subscription(bot, notify, subscription, timestamp, observe=None):
+    """Опрос API для одной подписки; возвращает новую метку времени.
+
+    Смены статусов только передаются в `notify` (outbox или доску),
+    поэтому метка времени сдвигается независимо от того, удалась ли
+    отправка. Успешный ответ целиком передаётся в `observe`, если он
+    задан.
+    """
+    context = SUBSCRIPTION.set(subscription)
+    try:
+        response = get_api_answer(timestamp)
+        homeworks = check_response(response)
+        if observe:
+            observe(subscription, homeworks)
+        validated = VALIDATED.set(True)
+        try:
+            for homework in reversed(homeworks or []):
+                notify(subscription, homework, parse_status(homework))
+        finally:
+            VALIDATED.reset(validated)
+        return response.get('current_date', timestamp)
+    except Exception as error:
+        message = ERROR_MESSAGE.format(error)
+        logging.exception(message)
+        send_message(bot, message)
+    finally:
+        SUBSCRIPTION.reset(context)
+    return timestamp
+
+
+def heartbeat(watchdog, name, period):
+    """Отметка живости фонового цикла с периодом `period` или None."""
+    return watchdog and watchdog.heartbeat(name, WATCHDOG_GRACE + period)
+
+
+def load_subscriptions(registry, watchdog=None):
+    """Заполняет реестр подписок из файла или из переменных окружения."""
+    if not SUBSCRIPTIONS_FILE:
+        default = Subscription('default', PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+        registry.apply(Config({}, {default.name: default}), int(time.time()))
+        return
+    watcher = ConfigWatcher(
+        SUBSCRIPTIONS_FILE, registry,
+        heartbeat=heartbeat(watchdog, 'config', CONFIG_CHECK_PERIOD))
+    watcher.reload(int(time.time()))
+    signal.signal(signal.SIGHUP, watcher.request_reload)
+    watcher.start()
+
+
+def start_leases(registry, watchdog=None):
+    """Включает аренду подписок, если задана общая база узлов."""
+    if not LEASE_DB:
+        return None
+    leases = LeaseManager(LEASE_DB, NODE_ID)
+    keeper = LeaseKeeper(leases, registry,
+                         heartbeat(watchdog, 'leases', leases.ttl / 3),
+                         roles=tuple(role for role, enabled in (
+                             (COMMANDS_ROLE, BOT_COMMANDS),
+                             (DIGEST_ROLE, ANALYTICS or DIGEST_ONLY))
+                             if enabled))
+    keeper.tick()
+    keeper.start()
+    return keeper
+
+
+def stop_leases(keeper):
+    """Отдаёт аренды другим узлам.
+
+    Прогресс к этому моменту сохранён последним checkpoint; снимать его
+    заново нельзя, опросы в пуле потоков могли сдвинуть метки уже
+    после фиксации outbox.
+    """
+    if keeper is None:
+        return
+    keeper.stopped.set()
+    keeper.leases.release_all()
+
+
+def admission(keeper=None, validator=None, backpressure=None):
+    """Проверки, которые подписка проходит перед каждым опросом."""
+    checks = []
+    if keeper:
+        checks.append(lambda subscription: keeper.leases.owns(
+            subscription.name))
+    if validator:
+        checks.append(lambda subscription: not validator.blocked(
+            subscription.practicum_token))
+    if backpressure:
+        checks.append(backpressure.admit)
+    return checks
+
+
+def poll_all(pool, notify, registry, shutdown, executor=None, admit=(),
+             observe=None, watchdog=None):
+    """Опрашивает подписки узла, пока не пришёл сигнал остановки.
+
+    Подписка опрашивается, только если её пропускают все проверки
+    `admit` (аренда, карантин токена, заполненность очереди отправки).
+    Проверки выполняются непосредственно перед опросом, так что
+    заполнение очереди по ходу раунда сразу его притормаживает.
+
+    С пулом потоков подписки опрашиваются параллельно, но каждая
+    попадает в раунд один раз, а раунд ждёт все опросы, поэтому порядок
+    внутри подписки сохраняется, а метки времени сохраняются на диск
+    только после уведомлений, полученных до них.
+
+    Со сторожем `watchdog` каждый опрос отмечается как цикл своего
+    потока, а его завершение продвигает главный цикл, так что долгий
+    раунд из многих подписок не считается зависшим.
+    """
+    def poll(subscription, timestamp):
+        if shutdown.requested.is_set() or not all(
+                check(subscription) for check in admit):
+            return
+        name = POLL_LOOP.format(threading.current_thread().name)
+        if watchdog:
+            watchdog.beat(name, POLL_WITHIN)
+        try:
+            registry.advance(
+                subscription.name,
+                poll_subscription(pool.bot_for(subscription.chat_id),
+                                  notify, subscription, timestamp, observe))
+        finally:
+            if watchdog:
+                watchdog.forget(name)
+                watchdog.touch('main')
+
+    due = registry.items()
+    if executor is None:
+        for subscription, timestamp in due:
+            poll(subscription, timestamp)
+    elif due:
+        list(executor.map(poll, *zip(*due)))
+
+
+def bot_tokens(registry):
+    """Токены всех ботов пула: основной, из окружения и из настроек."""
+    return ([TELEGRAM_TOKEN] + TELEGRAM_TOKENS
+            + registry.setting('telegram_tokens', []))
+
+
+def token_checks(registry):
+    """Все токены Практикума и Telegram, которые использует бот."""
+    return [TokenCheck('practicum', subscription.name,
+                       subscription.practicum_token)
+            for subscription, _ in registry.items()] + [
+        TokenCheck('telegram', bot_id(token), token)
+        for token in bot_tokens(registry)]
+
+
+def refresh_tokens(pool, registry, validator=None):
+    """Проверяет токены, которым пора, и обновляет состав пула ботов.
+
+    Боты с токеном в карантине выводятся из пула; основной бот остаётся,
+    если других нет.
+    """
+    tokens = bot_tokens(registry)
+    if validator:
+        validator.validate(validator.due(token_checks(registry)))
+        tokens = [token for token in tokens
+                  if not validator.blocked(token)] or [TELEGRAM_TOKEN]
+    pool.sync(tokens)
+
+
+def start_boards(pool, watchdog=None):
+    """Включает режим доски статусов, если он задан."""
+    if not BOARD_MODE:
+        return None
+    return BoardManager(
+        HOMEWORK_VERDICTS, pool.bot_for,
+        saved=load_json(BOARD_FILE) if BOARD_FILE else None,
+        heartbeat=heartbeat(watchdog, 'boards', FLUSH_PERIOD)).start()
+
+
+def stop_workers(executor=None, commands=None):
+    """Останавливает пул опроса и ответы на команды, не дожидаясь их."""
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if commands:
+        commands.stopped.set()
+
+
+def drain_outbox(pool, outbox, shutdown):
+    """Отправляет очередь outbox перед остановкой.
+
+    На отправку отведено OUTBOX_DRAIN_DEADLINE секунд; что не успело
+    уйти, остаётся в журнале и будет отправлено после перезапуска.
+    """
+    with shutdown.bounded(OUTBOX_DRAIN_DEADLINE):
+        pool.drain(outbox, deliver)
+
+
+def stop_boards(boards, shutdown):
+    """Выводит накопившиеся изменения досок и сохраняет доски.
+
+    Вызывается после фиксации остального состояния: на вывод отведено
+    BOARD_FLUSH_DEADLINE секунд, так что недоступный Telegram
+    не задерживает остановку и не мешает сохранить прогресс.
+    """
+    if boards is None:
+        return
+    with shutdown.bounded(BOARD_FLUSH_DEADLINE):
+        boards.stop()
+    if BOARD_FILE:
+        save_state(BOARD_FILE, boards.snapshot())
+
+
+def start_analytics():
+    """Включает статистику проверок для сводок, если она задана."""
+    if not (ANALYTICS or DIGEST_ONLY):
+        return None
+    return ReviewAnalytics(
+        DIGEST_PERIOD,
+        saved=load_json(ANALYTICS_FILE) if ANALYTICS_FILE else None)
+
+
+def notifier(outbox, boards=None, analytics=None):
+    """Получатели смен статусов: outbox или доска, затем статистика.
+
+    В режиме DIGEST_ONLY отдельные сообщения не отправляются, остаются
+    только сводки.
+    """
+    sinks = [] if DIGEST_ONLY else [
+        boards.update if boards else functools.partial(enqueue, outbox)]
+    if analytics:
+        sinks.append(analytics.update)
+    return fan_out(sinks)
+
+
+def evict_works(analytics, progress, keeper=None):
+    """Забывает в статистике работы, которые опрос уже не вернёт.
+
+    С арендой подписок забываются и работы подписок, ушедших к другим
+    узлам.
+    """
+    if not analytics:
+        return
+    if keeper:
+        progress = {name: timestamp for name, timestamp in progress.items()
+                    if name in keeper.leases.owned}
+    analytics.evict(progress)
+
+
+def share_analytics(keeper=None, analytics=None):
+    """Передаёт изменения статистики проверок в общую базу аренд."""
+    if not (keeper and analytics):
+        return
+    try:
+        analytics.collect(keeper.leases.add_stats)
+    except sqlite3.Error as error:
+        logging.error(ANALYTICS_SHARE_ERROR.format(error=error))
+
+
+def send_digests(outbox, analytics=None, keeper=None):
+    """Ставит в outbox сводки, если подошёл их срок.
+
+    С арендой подписок сводки по счётчикам всех узлов отправляет только
+    узел с ролью DIGEST_ROLE, так что чат получает одну сводку.
+    """
+    if not analytics or not analytics.due():
+        return
+    chats = None
+    if keeper:
+        try:
+            chats = (keeper.leases.take_stats(keep=('reviewing',))
+                     if keeper.leases.holds(DIGEST_ROLE) else {})
+        except sqlite3.Error as error:
+            logging.error(ANALYTICS_SHARE_ERROR.format(error=error))
+            return
+    digests, started = analytics.digests(chats=chats)
+    for chat_id, text in digests:
+        outbox.put(f'digest:{chat_id}:{int(started)}', chat_id, text)
+
+
+def start_commands(pool, keeper=None, watchdog=None):
+    """Включает ответы на команды из кэша статусов, если они заданы.
+
+    С арендой подписок на команды отвечает только узел, держащий роль
+    COMMANDS_ROLE.
+    """
+    if not BOT_COMMANDS:
+        return None, None
+    cache = StatusCache(
+        HOMEWORK_VERDICTS, STALE_AFTER,
+        saved=load_json(STATUS_CACHE_FILE) if STATUS_CACHE_FILE else None)
+    server = CommandServer(
+        pool.bot_for_token(TELEGRAM_TOKEN), cache,
+        heartbeat=heartbeat(watchdog, 'commands', LONG_POLL_TIMEOUT),
+        active=keeper and functools.partial(keeper.leases.holds,
+                                            COMMANDS_ROLE))
+    server.start()
+    return cache, server
+
+
+def register_chats(cache, registry):
+    """Обновляет в кэше команд соответствие чатов подпискам."""
+    if cache:
+        cache.register(subscription for subscription, _ in registry.items())
+
+
+def share_statuses(keeper=None, cache=None):
+    """Обменивается статусами работ с другими узлами через базу аренд.
+
+    Каждый узел публикует статусы своих подписок, а узел с ролью
+    COMMANDS_ROLE забирает остальные, чтобы отвечать по всем чатам.
+    """
+    if not (keeper and cache):
+        return
+    try:
+        keeper.leases.save_statuses(cache.snapshot())
+        if keeper.leases.holds(COMMANDS_ROLE):
+            cache.merge(keeper.leases.load_statuses())
+    except sqlite3.Error as error:
+        logging.error(STATUSES_SHARE_ERROR.format(error=error))
+
+
+def snapshots(boards=None, cache=None, analytics=None):
+    """Файлы и снимки состояния, сохраняемые при каждой фиксации."""
+    return [(path, source.snapshot)
+            for path, source in ((BOARD_FILE, boards),
+                                 (STATUS_CACHE_FILE, cache),
+                                 (ANALYTICS_FILE, analytics))
+            if path and source]
+
+
+def checkpoint(outbox, registry, keeper=None, saved=()):
+    """Фиксирует outbox и снимки `saved`, затем прогресс подписок.
+
+    Порядок важен: метка времени не должна оказаться на диске раньше
+    уведомлений, полученных до неё. Поэтому прогресс снимается до
+    фиксации outbox: опрос, который ещё идёт в пуле потоков (например,
+    при остановке), может поставить уведомления и сдвинуть метку после
+    фиксации, и такая метка на диск не попадёт. Возвращает сохранённые
+    метки времени.
+    """
+    progress = registry.snapshot()
+    outbox.commit()
+    for path, snapshot in saved:
+        save_state(path, snapshot())
+    if keeper:
+        keeper.leases.save_progress(progress)
+    if STATE_FILE:
+        save_state(STATE_FILE, progress)
+    return progress
+
+
 def main():
     """Основная логика работы бота."""
     if not check_tokens():
         raise ValueError(TOKEN_ERROR)
+    if not check_config():
+        raise ValueError(PROGRESS_WITHOUT_OUTBOX)
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            homeworks = check_response(response)
-            if homeworks:
-                if send_message(bot, parse_status(homeworks[0])):
-                    timestamp = response.get('current_date', timestamp)
-        except Exception as error:
-            message = ERROR_MESSAGE.format(error=error)
-            logging.exception(message)
-            send_message(bot, message)
-        finally:
-            time.sleep(RETRY_PERIOD)
+    if TELEGRAM_API_URL:
+        bot.base_url = TELEGRAM_API_URL + TELEGRAM_TOKEN
+    shutdown = GracefulShutdown()
+    shutdown.install()
+    profiler = Profiler(sys.modules[__name__], PROFILED_FUNCTIONS,
+                        output=PROFILE_OUTPUT)
+    signal.signal(signal.SIGUSR1, profiler.toggle)
+    if PROFILE:
+        profiler.enable()
+    watchdog = Watchdog(sys.modules[__name__], WATCHED_CALLS,
+                        ABANDONED_RESULTS)
+    if WATCHDOG or HEALTH_PORT:
+        watchdog.enable(HEALTH_PORT or None)
+    recorder = TrafficRecorder(
+        sys.modules[__name__], TRAFFIC_CAPTURE,
+        secrets=[PRACTICUM_TOKEN, TELEGRAM_TOKEN] + TELEGRAM_TOKENS,
+    ).start() if TRAFFIC_CAPTURE else None
+    registry = SubscriptionRegistry(load_state(STATE_FILE) if STATE_FILE
+                                    else None)
+    load_subscriptions(registry, watchdog)
+    outbox = Outbox(OUTBOX_PATH)
+    pool = BotPool(base_url=TELEGRAM_API_URL)
+    pool.add(TELEGRAM_TOKEN, bot)
+    keeper = start_leases(registry, watchdog)
+    validator = (TokenValidator(ENDPOINT, TELEGRAM_API_URL)
+                 if VALIDATE_TOKENS else None)
+    boards = start_boards(pool, watchdog)
+    analytics = start_analytics()
+    notify = notifier(outbox, boards, analytics)
+    cache, commands = start_commands(pool, keeper, watchdog)
+    saved = snapshots(boards, cache, analytics)
+    backpressure = Backpressure(outbox, QUEUE_CAPACITY)
+    admit = admission(keeper, validator, backpressure)
+    executor = (ThreadPoolExecutor(POLL_WORKERS, thread_name_prefix='poll')
+                if POLL_WORKERS > 1 else None)
+    try:
+        while not shutdown.requested.is_set():
+            watchdog.beat('main', WATCHDOG_GRACE + registry.setting(
+                'retry_period', RETRY_PERIOD))
+            profiler.apply()
+            refresh_tokens(pool, registry, validator)
+            register_chats(cache, registry)
+            poll_all(pool, notify, registry, shutdown, executor, admit,
+                     cache and cache.observe, watchdog)
+            share_statuses(keeper, cache)
+            share_analytics(keeper, analytics)
+            backpressure.observe()
+            send_digests(outbox, analytics, keeper)
+            evict_works(analytics,
+                        checkpoint(outbox, registry, keeper, saved), keeper)
+            pool.drain(outbox, deliver,
+                       functools.partial(watchdog.touch, 'main'))
+            pool.report()
+            backpressure.report()
+            API_CLIENT.report()
+            if profiler.report_due():
+                profiler.report()
+            retry_period = registry.setting('retry_period', RETRY_PERIOD)
+            with shutdown.interruptible():
+                time.sleep(retry_period)
+    except (ShutdownRequested, ShutdownDeadline):
+        pass
+    finally:
+        shutdown.disarm()
+        stop_workers(executor, commands)
+        drain_outbox(pool, outbox, shutdown)
+        checkpoint(outbox, registry, keeper, saved)
+        stop_boards(boards, shutdown)
+        stop_leases(keeper)
+        shutdown.restore()
+        if recorder:
+            recorder.stop()
+        watchdog.disable()
+        profiler.disable()
+    logging.info(SHUTDOWN_INFO)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+
+WINDOW = 200
+MIN_SAMPLES = 20
+DEFAULT_TIMEOUT = 30.0
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 60.0
+TIMEOUT_FACTOR = 3
+HEDGE_BUDGET = 0.05
+HEDGE_BURST = 5
+HEDGE_WORKERS = 16
+
+HEDGE_SENT = 'Запрос к {url} медленнее p95 ({delay:.2f} с), дублируем'
+LATENCY_STATS = ('{url}: p50 {p50:.3f} с, p95 {p95:.3f} с, p99 {p99:.3f} с, '
+                 'таймаут {timeout:.1f} с, дублей {hedges} из {requests}')
+
+
+class LatencyTracker:
+    """Скользящее окно последних задержек одного адреса."""
+
+    def __init__(self, window=WINDOW):
+        """Окно из последних `window` задержек."""
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        """Учитывает задержку одного запроса."""
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, share):
+        """Задержка, быстрее которой доля `share` запросов окна."""
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(int(share * len(samples)), len(samples) - 1)]
+
+    def timeout(self):
+        """Таймаут из недавнего p99 с запасом, в разумных пределах."""
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return DEFAULT_TIMEOUT
+        return min(max(p99 * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT)
+
+
+class HedgeBudget:
+    """Бюджет дублирующих запросов: не больше `ratio` от всех запросов.
+
+    Каждый запрос добавляет в копилку `ratio` жетона, дубль тратит
+    целый жетон; копилка ограничена `burst`, чтобы после долгого
+    затишья не случилось всплеска дублей.
+    """
+
+    def __init__(self, ratio=HEDGE_BUDGET, burst=HEDGE_BURST):
+        """Бюджет в долю `ratio` запросов, не больше `burst` сразу."""
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+
+    def on_request(self):
+        """Учитывает обычный запрос."""
+        with self.lock:
+            self.requests += 1
+            self.tokens = min(self.tokens + self.ratio, self.burst)
+
+    def try_spend(self):
+        """Разрешает дубль, если в бюджете есть жетон."""
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+
+
+class AdaptiveClient:
+    """GET-запросы с таймаутом по недавним задержкам и дублированием.
+
+    Таймаут каждого адреса выводится из p99 последних ответов. Если
+    включено дублирование и запрос идёт дольше p95, отправляется второй
+    такой же запрос, и используется ответ, пришедший первым.
+    """
+
+    def __init__(self, hedge=False, budget=HEDGE_BUDGET):
+        """Клиент; `hedge` включает дублирование медленных запросов."""
+        self.hedge = hedge
+        self.budget = HedgeBudget(budget)
+        self.trackers = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def tracker(self, url):
+        """Статистика задержек адреса."""
+        with self.lock:
+            return self.trackers.setdefault(url, LatencyTracker())
+
+    def timed(self, tracker, timeout, **kwargs):
+        """Один запрос с замером; таймаут учитывается как задержка."""
+        started = time.monotonic()
+        try:
+            response = requests.get(timeout=timeout, **kwargs)
+        except requests.exceptions.Timeout:
+            tracker.record(timeout)
+            raise
+        tracker.record(time.monotonic() - started)
+        return response
+
+    def get(self, url, **kwargs):
+        """GET с адаптивным таймаутом и, если можно, дублированием."""
+        tracker = self.tracker(url)
+        timeout = tracker.timeout()
+        self.budget.on_request()
+        delay = tracker.percentile(0.95) if self.hedge else None
+        if delay is None:
+            return self.timed(tracker, timeout, url=url, **kwargs)
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    HEDGE_WORKERS, thread_name_prefix='hedge')
+        first = self.executor.submit(
+            self.timed, tracker, timeout, url=url, **kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done or not self.budget.try_spend():
+            return first.result()
+        logging.info(HEDGE_SENT.format(url=url, delay=delay))
+        second = self.executor.submit(
+            self.timed, tracker, timeout, url=url, **kwargs)
+        return self.first_success([first, second])
+
+    def first_success(self, futures):
+        """Результат первого успешного запроса; иначе — первая ошибка."""
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def report(self):
+        """Задержки и таймауты по адресам для лога."""
+        with self.lock:
+            trackers = dict(self.trackers)
+        for url, tracker in trackers.items():
+            if tracker.percentile(0.5) is None:
+                continue
+            logging.info(LATENCY_STATS.format(
+                url=url, p50=tracker.percentile(0.5),
+                p95=tracker.percentile(0.95), p99=tracker.percentile(0.99),
+                timeout=tracker.timeout(), hedges=self.budget.hedges,
+                requests=self.budget.requests))
@@ -0,0 +1,315 @@
+import contextlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+
+LEASE_TTL = 30
+
+LEASES_CHANGED = 'Узел {node}: получено подписок {acquired}, отдано {released}'
+LEASE_ERROR = 'Узел {node}: не удалось обновить аренды: {error}'
+ROLE_CHANGED = 'Узел {node}: роль {role} {action}'
+ROLE_TAKEN = 'получена'
+ROLE_LOST = 'потеряна'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nodes (
+    node TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    subscription TEXT PRIMARY KEY,
+    owner TEXT,
+    expires REAL NOT NULL DEFAULT 0,
+    progress INTEGER
+);
+CREATE TABLE IF NOT EXISTS roles (
+    role TEXT PRIMARY KEY,
+    owner TEXT,
+    expires REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    subscription TEXT PRIMARY KEY,
+    checked_at REAL NOT NULL,
+    homeworks TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_stats (
+    chat TEXT PRIMARY KEY,
+    stats TEXT NOT NULL
+);
+'''
+
+
+def add_counters(total, delta):
+    """Сумма счётчиков: числа складываются, списки — поэлементно."""
+    result = dict(total)
+    for field, value in delta.items():
+        if isinstance(value, list):
+            saved = result.get(field) or [0] * len(value)
+            result[field] = [a + b for a, b in zip(saved, value)]
+        else:
+            result[field] = result.get(field, 0) + value
+    return result
+
+
+class LeaseManager:
+    """Аренда подписок узлами через общую базу SQLite.
+
+    Каждый узел пульсирует в таблице nodes и держит аренду своих подписок
+    в таблице leases. Подписку опрашивает только владелец действующей
+    аренды. Узлы делят подписки поровну: лишние аренды отдаются, свободные
+    и просроченные забираются, так что подписки умершего узла переходят
+    к живым не позже чем через `ttl` секунд. Вместе с арендой хранится
+    метка времени опроса, чтобы новый владелец продолжил с неё. Поэтому
+    лишнюю подписку узел перестаёт опрашивать сразу, но отдаёт её только
+    в save_progress, в одной транзакции с её меткой времени.
+
+    Кроме подписок узлы арендуют роли — работу, которую должен делать
+    ровно один узел (например, ответы на команды бота), — и делятся
+    через базу последними статусами работ своих подписок и счётчиками
+    статистики проверок по чатам.
+    """
+
+    def __init__(self, path, node, ttl=LEASE_TTL):
+        """Открывает общую базу аренд `path` от имени узла `node`."""
+        self.path = path
+        self.node = node
+        self.ttl = ttl
+        self.owned = frozenset()
+        self.releasing = frozenset()
+        self.renewed_at = 0.0
+        self.held = {}
+        self.connection = sqlite3.connect(
+            path, timeout=ttl, isolation_level=None,
+            check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+
+    def owns(self, name, now=None):
+        """Держит ли узел действующую аренду подписки.
+
+        Если аренды давно не удавалось продлить, узел считает их
+        потерянными, даже не дозвавшись до базы.
+        """
+        now = time.time() if now is None else now
+        return name in self.owned and now - self.renewed_at < self.ttl
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Курсор внутри транзакции BEGIN IMMEDIATE под блокировкой узла."""
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+
+    def rebalance(self, names, now=None):
+        """Продлевает аренды и перераспределяет подписки между узлами.
+
+        Возвращает словарь только что полученных подписок с сохранённой
+        для них метки времени. Лишние подписки не отдаются сразу:
+        их аренда продлевается до ближайшего save_progress.
+        """
+        now = time.time() if now is None else now
+        names = set(names)
+        with self.transaction() as cursor:
+            return self.rebalance_locked(cursor, names, now)
+
+    def rebalance_locked(self, cursor, names, now):
+        """Тело транзакции rebalance."""
+        cursor.execute(
+            'INSERT INTO nodes (node, heartbeat) VALUES (?, ?) '
+            'ON CONFLICT(node) DO UPDATE SET heartbeat = excluded.heartbeat',
+            (self.node, now))
+        live = {row[0] for row in cursor.execute(
+            'SELECT node FROM nodes WHERE heartbeat > ?', (now - self.ttl,))}
+        leases = {row[0]: row[1:] for row in cursor.execute(
+            'SELECT subscription, owner, expires, progress FROM leases')}
+        target = math.ceil(len(names) / len(live)) if names else 0
+        mine = sorted(name for name in names
+                      if name in leases and leases[name][0] == self.node
+                      and leases[name][1] > now)
+        released = mine[target:]
+        kept = mine[:target]
+        free = sorted(name for name in names - set(mine)
+                      if name not in leases or leases[name][1] <= now
+                      or leases[name][0] not in live)
+        taken = free[:max(target - len(kept), 0)]
+        cursor.executemany(
+            'INSERT INTO leases (subscription, owner, expires) '
+            'VALUES (?, ?, ?) ON CONFLICT(subscription) DO UPDATE '
+            'SET owner = excluded.owner, expires = excluded.expires',
+            [(name, self.node, now + self.ttl)
+             for name in kept + taken + released])
+        self.owned = frozenset(kept + taken)
+        self.releasing = frozenset(released)
+        self.renewed_at = now
+        if taken or released:
+            logging.info(LEASES_CHANGED.format(
+                node=self.node, acquired=len(taken), released=len(released)))
+        return {name: leases[name][2] if name in leases else None
+                for name in taken}
+
+    def claim(self, role, now=None):
+        """Берёт или продлевает аренду роли; возвращает, держит ли её узел."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.connection.execute(
+                'INSERT INTO roles (role, owner, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT(role) DO UPDATE SET owner = excluded.owner, '
+                'expires = excluded.expires WHERE roles.owner = '
+                'excluded.owner OR roles.owner IS NULL OR roles.expires <= ?',
+                (role, self.node, now + self.ttl, now))
+            owner, = self.connection.execute(
+                'SELECT owner FROM roles WHERE role = ?', (role,)).fetchone()
+        held = owner == self.node
+        if held != (role in self.held):
+            logging.info(ROLE_CHANGED.format(
+                node=self.node, role=role,
+                action=ROLE_TAKEN if held else ROLE_LOST))
+        if held:
+            self.held[role] = now + self.ttl
+        else:
+            self.held.pop(role, None)
+        return held
+
+    def holds(self, role, now=None):
+        """Держит ли узел действующую аренду роли."""
+        now = time.time() if now is None else now
+        return now < self.held.get(role, 0)
+
+    def save_statuses(self, entries):
+        """Публикует статусы работ подписок, которыми владеет узел.
+
+        `entries` — снимок StatusCache: подписка -> [время, работы].
+        """
+        with self.lock:
+            self.connection.executemany(
+                'INSERT INTO statuses (subscription, checked_at, homeworks) '
+                'VALUES (?, ?, ?) ON CONFLICT(subscription) DO UPDATE SET '
+                'checked_at = excluded.checked_at, '
+                'homeworks = excluded.homeworks',
+                [(name, checked_at, json.dumps(homeworks, ensure_ascii=False))
+                 for name, (checked_at, homeworks) in entries.items()
+                 if name in self.owned])
+
+    def load_statuses(self):
+        """Статусы работ всех подписок, опубликованные узлами."""
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT subscription, checked_at, homeworks FROM statuses'
+            ).fetchall()
+        return {name: [checked_at, json.loads(homeworks)]
+                for name, checked_at, homeworks in rows}
+
+    def save_progress(self, timestamps):
+        """Сохраняет метки времени подписок узла и отдаёт лишние.
+
+        Метки отдаваемых подписок записываются в той же транзакции,
+        что и снятие аренды, поэтому новый владелец продолжит ровно
+        с того места, где остановился этот узел.
+        """
+        with self.transaction() as cursor:
+            releasing = self.releasing
+            cursor.executemany(
+                'UPDATE leases SET progress = ? '
+                'WHERE subscription = ? AND owner = ?',
+                [(timestamp, name, self.node)
+                 for name, timestamp in timestamps.items()
+                 if name in self.owned or name in releasing])
+            cursor.executemany(
+                'UPDATE leases SET owner = NULL, expires = 0 '
+                'WHERE subscription = ? AND owner = ?',
+                [(name, self.node) for name in releasing])
+            self.releasing = frozenset()
+
+    def add_stats(self, deltas):
+        """Прибавляет к общим счётчикам чатов изменения этого узла.
+
+        `deltas` — чат -> счётчики; числа складываются, списки
+        (гистограммы) — поэлементно.
+        """
+        if not deltas:
+            return
+        with self.transaction() as cursor:
+            saved = {chat: json.loads(stats) for chat, stats in cursor.execute(
+                'SELECT chat, stats FROM chat_stats')}
+            cursor.executemany(
+                'INSERT INTO chat_stats (chat, stats) VALUES (?, ?) '
+                'ON CONFLICT(chat) DO UPDATE SET stats = excluded.stats',
+                [(chat, json.dumps(add_counters(saved.get(chat, {}), delta)))
+                 for chat, delta in deltas.items()])
+
+    def take_stats(self, keep=()):
+        """Забирает общие счётчики чатов и обнуляет все, кроме `keep`."""
+        with self.transaction() as cursor:
+            saved = {chat: json.loads(stats) for chat, stats in cursor.execute(
+                'SELECT chat, stats FROM chat_stats')}
+            cursor.executemany(
+                'UPDATE chat_stats SET stats = ? WHERE chat = ?',
+                [(json.dumps({field: stats[field] for field in keep
+                              if field in stats}), chat)
+                 for chat, stats in saved.items()])
+        return saved
+
+    def release_all(self):
+        """Отдаёт все аренды и уходит из списка узлов при остановке."""
+        with self.lock:
+            self.connection.execute(
+                'UPDATE leases SET owner = NULL, expires = 0 '
+                'WHERE owner = ?', (self.node,))
+            self.connection.execute(
+                'UPDATE roles SET owner = NULL, expires = 0 '
+                'WHERE owner = ?', (self.node,))
+            self.connection.execute(
+                'DELETE FROM nodes WHERE node = ?', (self.node,))
+        self.owned = self.releasing = frozenset()
+        self.held = {}
+
+
+class LeaseKeeper(threading.Thread):
+    """Фоновое продление аренд, независимое от длинной паузы опроса."""
+
+    def __init__(self, leases, registry, heartbeat=None, roles=()):
+        """Готовит поток продления аренд подписок `registry` и ролей.
+
+        `heartbeat` вызывается на каждом продлении, чтобы сторож видел,
+        что поток жив.
+        """
+        super().__init__(daemon=True)
+        self.leases = leases
+        self.registry = registry
+        self.heartbeat = heartbeat
+        self.roles = roles
+        self.stopped = threading.Event()
+
+    def tick(self):
+        """Одно продление: перераспределяет подписки реестра."""
+        names = [subscription.name
+                 for subscription, _ in self.registry.items()]
+        try:
+            acquired = self.leases.rebalance(names)
+            for role in self.roles:
+                self.leases.claim(role)
+        except sqlite3.Error as error:
+            logging.error(LEASE_ERROR.format(
+                node=self.leases.node, error=error))
+            return
+        for name, progress in acquired.items():
+            if progress is not None:
+                self.registry.advance(name, progress)
+
+    def run(self):
+        """Продлевает аренды каждую треть срока их действия."""
+        while not self.stopped.wait(self.leases.ttl / 3):
+            if self.heartbeat:
+                self.heartbeat()
+            self.tick()
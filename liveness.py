@@ -0,0 +1,251 @@
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from exceptions import CallAbandoned
+from wrappers import registry
+
+
+CHECK_PERIOD = 5
+CALL_WORKERS = 64
+HEALTH_HOST = '127.0.0.1'
+HEALTH_PATH = '/health'
+
+CALL_ABANDONED = 'Вызов {name} не уложился в {deadline} с и брошен'
+CALL_STUCK = 'Вызов {name} идёт {elapsed:.0f} с (срок {deadline} с):\n{stack}'
+LOOP_STALLED = ('Цикл {name} не продвигается {elapsed:.0f} с '
+                '(ожидалось {within} с):\n{stack}')
+LOOP_RECOVERED = 'Цикл {name} снова продвигается'
+HEALTH_STARTED = 'Проверка живости: http://{host}:{port}{path}'
+
+
+def thread_stack(thread_id):
+    """Текущий стек потока в виде текста."""
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return '<поток завершён>'
+    return ''.join(traceback.format_stack(frame))
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Отдаёт состояние сторожа: 200, если все циклы живы, иначе 503."""
+
+    def log_message(self, format, *args):
+        """Не пишет каждый запрос проверки в stderr."""
+        pass
+
+    def do_GET(self):
+        """Ответ на запрос состояния."""
+        if self.path != HEALTH_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        health = self.server.watchdog.health()
+        body = json.dumps(health, ensure_ascii=False).encode()
+        self.send_response(HTTPStatus.OK if health['ok']
+                           else HTTPStatus.SERVICE_UNAVAILABLE)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Watchdog(threading.Thread):
+    """Сторож живости циклов и зависших вызовов.
+
+    Циклы отмечают продвижение через `beat(name, within)`: следующая
+    отметка ожидается не позже чем через `within` секунд. Функции
+    модуля из `deadlines` на время работы сторожа подменяются
+    обёртками, которые выполняют вызов в отдельном потоке и бросают
+    его по истечении срока: вызывающий получает CallAbandoned или
+    значение из `fallbacks`, а зависший поток остаётся доживать сам.
+
+    Фоновый поток раз в `period` секунд пишет в лог стеки зависших
+    вызовов и остановившихся циклов, чтобы было видно, на каком
+    внешнем сервисе всё встало, а локальный HTTP-адрес отвечает 503,
+    пока хоть один цикл стоит, — по нему платформа перезапускает
+    только действительно зависшие процессы. Обёртки сторожа ближе
+    всех к исходным функциям.
+    """
+
+    depth = 0
+
+    def __init__(self, module, deadlines, fallbacks=None,
+                 period=CHECK_PERIOD, workers=CALL_WORKERS):
+        """Сторож вызовов `deadlines` модуля `module`."""
+        super().__init__(daemon=True)
+        self.module = module
+        self.deadlines = deadlines
+        self.fallbacks = fallbacks or {}
+        self.period = period
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.loops = {}
+        self.calls = {}
+        self.reported = set()
+        self.abandoned = 0
+        self.ids = itertools.count()
+        self.wrappers = registry(module)
+        self.executor = None
+        self.server = None
+        self.stopped = threading.Event()
+
+    def beat(self, name, within):
+        """Отмечает продвижение цикла `name` в текущем потоке."""
+        self.mark(name, within, threading.get_ident())
+
+    def touch(self, name):
+        """Отмечает продвижение цикла `name` из его рабочего потока.
+
+        Срок и поток, чей стек выводится при остановке, остаются
+        от последнего `beat`: так длинный раунд опроса не считается
+        зависшим, пока его опросы и отправки продвигаются.
+        """
+        with self.lock:
+            if name not in self.loops:
+                return
+            _, within, thread_id = self.loops[name]
+        self.mark(name, within, thread_id)
+
+    def mark(self, name, within, thread_id):
+        """Запоминает отметку цикла; пишет в лог, если он ожил."""
+        with self.lock:
+            self.loops[name] = (time.monotonic(), within, thread_id)
+            if name in self.reported:
+                self.reported.discard(name)
+                logging.info(LOOP_RECOVERED.format(name=name))
+
+    def heartbeat(self, name, within):
+        """Отметка цикла `name` для фонового потока, без аргументов."""
+        return functools.partial(self.beat, name, within)
+
+    def forget(self, name):
+        """Снимает цикл с наблюдения, например при штатной остановке."""
+        with self.lock:
+            self.loops.pop(name, None)
+
+    def tracked(self, name, function, args, kwargs):
+        """Тело вызова в потоке сторожа: учитывает его как идущий."""
+        call_id = next(self.ids)
+        with self.lock:
+            self.calls[call_id] = (name, time.monotonic(),
+                                   self.deadlines[name],
+                                   threading.get_ident())
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self.lock:
+                del self.calls[call_id]
+                self.reported.discard(call_id)
+
+    def wrap(self, name, function):
+        """Обёртка, бросающая вызов по истечении его срока."""
+        deadline = self.deadlines[name]
+
+        @functools.wraps(function)
+        def guarded(*args, **kwargs):
+            future = self.executor.submit(
+                contextvars.copy_context().run, self.tracked, name,
+                function, args, kwargs)
+            try:
+                return future.result(timeout=deadline)
+            except FutureTimeout:
+                future.cancel()
+                with self.lock:
+                    self.abandoned += 1
+                logging.error(CALL_ABANDONED.format(
+                    name=name, deadline=deadline))
+                if name in self.fallbacks:
+                    return self.fallbacks[name]
+                raise CallAbandoned(CALL_ABANDONED.format(
+                    name=name, deadline=deadline))
+        return guarded
+
+    def stuck(self, now=None):
+        """Остановившиеся циклы и вызовы дольше их срока."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            loops = {name: (now - at, within, thread_id)
+                     for name, (at, within, thread_id) in self.loops.items()
+                     if now - at > within}
+            calls = {call_id: (name, now - started, deadline, thread_id)
+                     for call_id, (name, started, deadline, thread_id)
+                     in self.calls.items() if now - started > deadline}
+        return loops, calls
+
+    def check(self):
+        """Пишет в лог стеки того, что встало, по разу на случай."""
+        loops, calls = self.stuck()
+        for name, (elapsed, within, thread_id) in loops.items():
+            if name not in self.reported:
+                self.reported.add(name)
+                logging.error(LOOP_STALLED.format(
+                    name=name, elapsed=elapsed, within=within,
+                    stack=thread_stack(thread_id)))
+        for call_id, (name, elapsed, deadline, thread_id) in calls.items():
+            if call_id not in self.reported:
+                self.reported.add(call_id)
+                logging.error(CALL_STUCK.format(
+                    name=name, elapsed=elapsed, deadline=deadline,
+                    stack=thread_stack(thread_id)))
+
+    def health(self):
+        """Состояние для проверки живости."""
+        loops, calls = self.stuck()
+        with self.lock:
+            abandoned = self.abandoned
+        return {
+            'ok': not loops,
+            'stalled': {name: round(elapsed, 1)
+                        for name, (elapsed, _, _) in loops.items()},
+            'stuck_calls': sorted(name for name, *_ in calls.values()),
+            'abandoned': abandoned,
+        }
+
+    def run(self):
+        """Проверяет циклы и вызовы, пока сторож не остановлен."""
+        while not self.stopped.wait(self.period):
+            self.check()
+
+    def serve(self, port, host=HEALTH_HOST):
+        """Запускает HTTP-адрес проверки живости."""
+        self.server = ThreadingHTTPServer((host, port), HealthHandler)
+        self.server.daemon_threads = True
+        self.server.watchdog = self
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        logging.info(HEALTH_STARTED.format(
+            host=host, port=self.server.server_address[1],
+            path=HEALTH_PATH))
+
+    def enable(self, port=None):
+        """Подставляет обёртки, запускает проверки и HTTP-адрес."""
+        self.executor = ThreadPoolExecutor(
+            self.workers, thread_name_prefix='watched')
+        self.wrappers.install(self, {
+            name: functools.partial(self.wrap, name)
+            for name in self.deadlines
+        }, self.depth)
+        if port is not None:
+            self.serve(port)
+        self.start()
+        return self
+
+    def disable(self):
+        """Возвращает исходные функции и останавливает сторожа."""
+        self.wrappers.uninstall(self)
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from exceptions import Undeliverable
+
+
+RECENT_KEYS = 10000
+COMPACT_AFTER = 1000
+RETRY_BASE = 60
+RETRY_MAX = 900
+
+OUTBOX_RESTORED = 'Из outbox {path} восстановлено неотправленных: {count}'
+OUTBOX_BROKEN_LINE = 'Пропущена повреждённая строка outbox {path}: {line!r}'
+OUTBOX_DUPLICATE = 'Уведомление {key} уже в outbox, пропускаем'
+OUTBOX_COMPACTED = 'Outbox {path} сжат: осталось записей {count}'
+OUTBOX_DEAD_LETTER = ('Уведомление {key} в чат {chat_id} не доставлено '
+                      'и снято с очереди: {reason}. Текст: {text!r}')
+OUTBOX_RETRY = 'Отправка в чат {chat_id} не удалась, повтор через {seconds} с'
+
+Notification = namedtuple('Notification', ('key', 'chat_id', 'text'))
+
+
+class Outbox:
+    """Журнал уведомлений с упреждающей записью на диск.
+
+    Каждое уведомление сначала дописывается в файл (`put`), и только
+    потом отправляется. Успешная отправка дописывает подтверждение
+    (`ack`). После перезапуска неподтверждённые записи отправляются
+    снова — доставка «хотя бы один раз». Ключ идемпотентности не даёт
+    поставить одно и то же уведомление в очередь дважды.
+
+    Записи копятся в буфере и сбрасываются на диск одним fsync
+    в `commit` — групповая фиксация на весь цикл опроса. Без пути
+    журнал живёт только в памяти.
+
+    Уведомление, которое в этот чат не доставить никогда (отправка
+    бросила Undeliverable: бот заблокирован, чата нет), снимается
+    с очереди записью `dead` и пишется в лог. После временной ошибки
+    уведомления остаются в очереди, а чат ждёт повтора с растущей
+    паузой от `retry_base` до `retry_max` секунд.
+    """
+
+    def __init__(self, path=None, recent_keys=RECENT_KEYS,
+                 compact_after=COMPACT_AFTER, retry_base=RETRY_BASE,
+                 retry_max=RETRY_MAX):
+        """Открывает журнал `path` и восстанавливает очередь."""
+        self.path = path
+        self.compact_after = compact_after
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.backoff = {}
+        self.dead = 0
+        self.lock = threading.RLock()
+        self.pending = OrderedDict()
+        self.recent = deque(maxlen=recent_keys)
+        self.recent_set = set()
+        self.buffer = []
+        self.acked = 0
+        if path:
+            self.restore()
+
+    def restore(self):
+        """Читает журнал и восстанавливает неподтверждённые записи."""
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+                if record['op'] == 'put':
+                    self.pending[record['key']] = Notification(
+                        record['key'], record['chat_id'], record['text'])
+                else:
+                    self.pending.pop(record['key'], None)
+                    self.remember(record['key'])
+                    self.acked += 1
+            except (ValueError, KeyError, TypeError):
+                logging.warning(OUTBOX_BROKEN_LINE.format(
+                    path=self.path, line=line))
+        logging.info(OUTBOX_RESTORED.format(
+            path=self.path, count=len(self.pending)))
+
+    def remember(self, key):
+        """Запоминает ключ доставленного уведомления."""
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_set.discard(self.recent[0])
+        self.recent.append(key)
+        self.recent_set.add(key)
+
+    def __len__(self):
+        """Число неотправленных уведомлений."""
+        return len(self.pending)
+
+    def put(self, key, chat_id, text):
+        """Ставит уведомление в очередь; дубликаты по ключу пропускаются."""
+        with self.lock:
+            if key in self.pending or key in self.recent_set:
+                logging.debug(OUTBOX_DUPLICATE.format(key=key))
+                return False
+            self.pending[key] = Notification(key, chat_id, text)
+            self.buffer.append({'op': 'put', 'key': key,
+                                'chat_id': chat_id, 'text': text})
+            return True
+
+    def ack(self, key, op='ack'):
+        """Отмечает уведомление доставленным."""
+        with self.lock:
+            if self.pending.pop(key, None) is None:
+                return
+            self.remember(key)
+            self.buffer.append({'op': op, 'key': key})
+            self.acked += 1
+
+    def dead_letter(self, notification, reason):
+        """Снимает с очереди уведомление, которое не доставить."""
+        logging.error(OUTBOX_DEAD_LETTER.format(
+            key=notification.key, chat_id=notification.chat_id,
+            reason=reason, text=notification.text))
+        with self.lock:
+            self.dead += 1
+        self.ack(notification.key, op='dead')
+
+    def waiting(self, chat_id, now=None):
+        """Ждёт ли чат повтора после неудачной отправки."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return self.backoff.get(chat_id, (0, 0.0))[1] > now
+
+    def retry_later(self, chat_id):
+        """Откладывает отправку в чат после временной ошибки."""
+        with self.lock:
+            failures = self.backoff.get(chat_id, (0, 0.0))[0] + 1
+            delay = min(self.retry_base * 2 ** (failures - 1),
+                        self.retry_max)
+            self.backoff[chat_id] = (failures, time.monotonic() + delay)
+        logging.warning(OUTBOX_RETRY.format(chat_id=chat_id, seconds=delay))
+
+    def commit(self):
+        """Сбрасывает накопленные записи на диск одним fsync."""
+        with self.lock:
+            if not self.buffer:
+                return
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.writelines(
+                        json.dumps(record, ensure_ascii=False) + '\n'
+                        for record in self.buffer)
+                    file.flush()
+                    os.fsync(file.fileno())
+            self.buffer.clear()
+            if self.path and self.acked >= self.compact_after:
+                self.compact()
+
+    def compact(self):
+        """Переписывает журнал, оставляя очередь и недавние ключи."""
+        records = [{'op': 'ack', 'key': key} for key in self.recent]
+        records.extend({'op': 'put', 'key': item.key,
+                        'chat_id': item.chat_id, 'text': item.text}
+                       for item in self.pending.values())
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record, ensure_ascii=False) + '\n'
+                            for record in records)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self.acked = 0
+        logging.info(OUTBOX_COMPACTED.format(
+            path=self.path, count=len(records)))
+
+    def queue(self):
+        """Снимок очереди неотправленных уведомлений."""
+        with self.lock:
+            return list(self.pending.values())
+
+    def deliver(self, queue, send):
+        """Отправляет уведомления по порядку, не фиксируя подтверждения.
+
+        Если отправка в чат временно не удалась, остальные уведомления
+        этого чата ждут повтора, чтобы не нарушить порядок; другие чаты
+        продолжают получать свои. Недоставляемые уведомления снимаются
+        с очереди и чат не задерживают. `send` возвращает None, если
+        отправка не состоялась не по вине чата (например, у бота отозван
+        токен): тогда чат ждёт следующего разбора без паузы.
+        """
+        blocked = set()
+        sent = 0
+        for notification in queue:
+            chat_id = notification.chat_id
+            if chat_id in blocked or self.waiting(chat_id):
+                continue
+            try:
+                delivered = send(notification)
+            except Undeliverable as error:
+                self.dead_letter(notification, error)
+                continue
+            if delivered:
+                self.ack(notification.key)
+                with self.lock:
+                    self.backoff.pop(chat_id, None)
+                sent += 1
+                continue
+            blocked.add(chat_id)
+            if delivered is not None:
+                self.retry_later(chat_id)
+        return sent
+
+    def drain(self, send):
+        """Отправляет всю очередь и фиксирует подтверждения."""
+        sent = self.deliver(self.queue(), send)
+        self.commit()
+        return sent
@@ -0,0 +1,208 @@
+import functools
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+from wrappers import registry
+
+
+SAMPLE_INTERVAL = 0.01
+REPORT_PERIOD = 60
+
+PROFILING_ENABLED = 'Профилирование включено: {}'
+PROFILING_DISABLED = 'Профилирование выключено'
+PROFILE_HEADER = ('Профиль за {seconds:.0f} с:\n'
+                  '{name:<16} {calls:>7} {total:>10} {mean:>10} {max:>10}')
+PROFILE_ROW = ('{name:<16} {calls:>7} {total:>10.3f} {mean:>10.4f} '
+               '{max:>10.4f}')
+STACKS_SAVED = 'Стеки для flamegraph записаны в {path}: {count} выборок'
+
+
+class FunctionStats:
+    """Накопленное время вызовов одной функции."""
+
+    def __init__(self):
+        """Пустая статистика."""
+        self.clear()
+
+    def clear(self):
+        """Обнуляет счётчики."""
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        """Учитывает один вызов."""
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стеки потоков в свёрнутом формате flamegraph."""
+
+    def __init__(self, stacks, lock, interval=SAMPLE_INTERVAL):
+        """Поток, раз в `interval` секунд пополняющий `stacks`."""
+        super().__init__(daemon=True)
+        self.stacks = stacks
+        self.lock = lock
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Снимает стеки, пока выборку не остановят."""
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, frame in frames.items():
+                    if ident != own:
+                        self.stacks[fold(frame)] += 1
+
+
+def fold(frame):
+    """Стек кадра в виде `модуль:функция;...` от корня к вершине."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler:
+    """Включаемый на лету профилировщик цикла опроса.
+
+    В выключенном состоянии ничего не стоит: замеряющие обёртки
+    подставляются в модуль только на время профилирования, а после
+    выключения возвращаются исходные функции. Обёртки профилировщика
+    внешние: замеряется время вызова вместе со сторожем и записью
+    трафика. Сигнал только запоминает нужное состояние, а включает
+    и выключает профилирование основной цикл через `apply`.
+    """
+
+    depth = 2
+
+    def __init__(self, module, names, output=None, sample=True,
+                 report_period=REPORT_PERIOD):
+        """Профилировщик функций `names` модуля `module`."""
+        self.module = module
+        self.names = names
+        self.output = output
+        self.sample = sample
+        self.report_period = report_period
+        self.wrappers = registry(module)
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.wanted = False
+        self.sampler = None
+        self.reset()
+
+    def reset(self):
+        """Начинает новый отчётный период."""
+        self.stats = {name: FunctionStats() for name in self.names}
+        self.stacks = Counter()
+        self.started = time.monotonic()
+
+    def wrap(self, name, function):
+        """Обёртка, замеряющая время вызова функции."""
+        stats = self.stats[name]
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    stats.add(elapsed)
+        return timed
+
+    def enable(self):
+        """Подставляет обёртки и запускает выборку стеков."""
+        self.wanted = True
+        if self.enabled:
+            return
+        self.reset()
+        self.wrappers.install(self, {
+            name: functools.partial(self.wrap, name) for name in self.names
+        }, self.depth)
+        self.enabled = True
+        if self.sample:
+            self.sampler = StackSampler(self.stacks, self.lock)
+            self.sampler.start()
+        logging.info(PROFILING_ENABLED.format(', '.join(self.names)))
+
+    def disable(self):
+        """Возвращает исходные функции и выводит итоговый отчёт."""
+        self.wanted = False
+        if not self.enabled:
+            return
+        self.wrappers.uninstall(self)
+        self.enabled = False
+        if self.sampler is not None:
+            self.sampler.stopped.set()
+            self.sampler = None
+        self.report()
+        logging.info(PROFILING_DISABLED)
+
+    def toggle(self, signum=None, frame=None):
+        """Обработчик сигнала: запрашивает включение или выключение.
+
+        Обработчик выполняется в основном потоке посреди любого кода,
+        в том числе под `self.lock`, поэтому только меняет флаг.
+        """
+        self.wanted = not self.wanted
+
+    def apply(self):
+        """Включает или выключает профилирование по запросу сигнала."""
+        if self.wanted != self.enabled:
+            if self.wanted:
+                self.enable()
+            else:
+                self.disable()
+
+    def report_due(self):
+        """Пора ли выводить периодический отчёт."""
+        return (self.enabled
+                and time.monotonic() - self.started >= self.report_period)
+
+    def table(self):
+        """Таблица времени по функциям за текущий период."""
+        with self.lock:
+            rows = [PROFILE_HEADER.format(
+                seconds=time.monotonic() - self.started, name='function',
+                calls='calls', total='total, s', mean='mean, s',
+                max='max, s')]
+            for name, stats in sorted(self.stats.items(),
+                                      key=lambda item: -item[1].total):
+                rows.append(PROFILE_ROW.format(
+                    name=name, calls=stats.calls, total=stats.total,
+                    mean=stats.total / stats.calls if stats.calls else 0,
+                    max=stats.max))
+        return '\n'.join(rows)
+
+    def write_stacks(self):
+        """Дописывает свёрнутые стеки в файл для flamegraph.pl/speedscope."""
+        with self.lock:
+            stacks = list(self.stacks.items())
+        with open(self.output, 'a', encoding='utf-8') as file:
+            for stack, count in stacks:
+                file.write(f'{stack} {count}\n')
+        logging.info(STACKS_SAVED.format(
+            path=self.output, count=sum(count for _, count in stacks)))
+
+    def report(self):
+        """Выводит отчёт и начинает новый период."""
+        logging.info(self.table())
+        if self.output and self.stacks:
+            self.write_stacks()
+        with self.lock:
+            for stats in self.stats.values():
+                stats.clear()
+            self.stacks.clear()
+            self.started = time.monotonic()
@@ -0,0 +1,145 @@
+import re
+from collections import namedtuple
+
+
+MISSING_KEY = 'Не найден ключ "{path}"'
+WRONG_TYPE = '{path}: ожидался {expected}, а получен {actual}'
+UNKNOWN_VALUE = '{path}: неизвестное значение {value!r}'
+SCHEMA_ERRORS = 'Ошибок в ответе API: {count}. {errors}'
+NONE_TYPE = type(None)
+
+Field = namedtuple('Field', ('type', 'required', 'choices', 'fields', 'items'))
+Problem = namedtuple('Problem', ('exception', 'message'))
+
+
+def field(type_, required=True, choices=None, fields=None, items=None):
+    """Описание поля схемы."""
+    return Field(type_, required, choices, fields, items)
+
+
+class Validator:
+    """Проверка значения по схеме, скомпилированной один раз.
+
+    Схема превращается в одно булево выражение, которое проверяет всё
+    значение за один проход без создания строк ошибок. Только если
+    выражение ложно, значение обходится повторно, чтобы собрать все
+    ошибки с путями до них.
+    """
+
+    def __init__(self, schema, name):
+        """Компилирует проверку схемы `schema` объекта `name`."""
+        self.schema = schema
+        self.name = name
+        self.namespace = {}
+        self.is_valid = self.namespace[self.compile_items(schema, single=True)]
+
+    def constant(self, value):
+        """Кладёт значение в пространство имён выражения."""
+        name = f'_c{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def compile_items(self, schema, single=False):
+        """Функция, проверяющая значение или каждый элемент списка.
+
+        Элементы перебираются обычным циклом с выходом на первой ошибке:
+        это заметно дешевле генератора внутри all(). Константы схемы
+        передаются аргументами по умолчанию, чтобы читаться как локальные
+        переменные.
+        """
+        name = f'_f{len(self.namespace)}'
+        self.namespace[name] = None
+        check = self.compile(schema, 'item')
+        bound = ''.join(f', {constant}={constant}' for constant in sorted(
+            set(re.findall(r'\b_[cf]\d+\b', check))))
+        if single:
+            source = (f'def {name}(item, type=type{bound}):\n'
+                      f'    return bool({check})\n')
+        else:
+            source = (f'def {name}(items, type=type{bound}):\n'
+                      f'    for item in items:\n'
+                      f'        if not ({check}):\n'
+                      f'            return False\n'
+                      f'    return True\n')
+        exec(source, self.namespace)
+        return name
+
+    def compile(self, schema, value):
+        """Выражение Python, истинное для значений по схеме."""
+        checks = [f'type({value}) is {self.constant(schema.type)}']
+        if schema.choices is not None:
+            choices = self.constant(frozenset(schema.choices))
+            checks.append(f'{value} in {choices}')
+        for key, child in (schema.fields or {}).items():
+            checks.append(self.compile_field(key, child, value))
+        if schema.items is not None:
+            checks.append(f'{self.compile_items(schema.items)}({value})')
+        return ' and '.join(checks)
+
+    def compile_field(self, key, schema, value):
+        """Выражение для поля словаря.
+
+        Простые обязательные поля читаются одним get(): отсутствующий ключ
+        даёт None, который не пройдёт ни проверку типа, ни выбор из
+        допустимых значений.
+        """
+        item = f'{value}.get({key!r})'
+        simple = (schema.required and schema.type is not NONE_TYPE
+                  and schema.fields is None and schema.items is None)
+        if simple and schema.choices is not None and None not in (
+                schema.choices):
+            choices = self.constant(frozenset(schema.choices))
+            return f'{item} in {choices}'
+        if simple:
+            return f'type({item}) is {self.constant(schema.type)}'
+        check = self.compile(schema, f'{value}[{key!r}]')
+        if schema.required:
+            return f'{key!r} in {value} and {check}'
+        return f'({key!r} not in {value} or ({check}))'
+
+    def problems(self, value):
+        """Все несоответствия значения схеме."""
+        found = []
+        self.walk(self.schema, value, self.name, found)
+        return found
+
+    def walk(self, schema, value, path, found):
+        """Рекурсивно собирает ошибки, запоминая путь до каждой."""
+        if not isinstance(value, schema.type):
+            found.append(Problem(TypeError, WRONG_TYPE.format(
+                path=path, expected=schema.type.__name__,
+                actual=type(value).__name__)))
+            return
+        if schema.choices is not None and value not in schema.choices:
+            found.append(Problem(ValueError, UNKNOWN_VALUE.format(
+                path=path, value=value)))
+        for key, child in (schema.fields or {}).items():
+            child_path = key if path == self.name else f'{path}.{key}'
+            if key in value:
+                self.walk(child, value[key], child_path, found)
+            elif child.required:
+                found.append(Problem(KeyError, MISSING_KEY.format(
+                    path=child_path)))
+        if schema.items is not None:
+            for index, item in enumerate(value):
+                self.walk(schema.items, item, f'{path}[{index}]', found)
+
+    def validate(self, value):
+        """Бросает исключение со всеми ошибками, если значение не по схеме.
+
+        Тип исключения — тип первой найденной ошибки (TypeError, KeyError
+        или ValueError), в сообщении перечислены все ошибки.
+        """
+        try:
+            if self.is_valid(value):
+                return value
+        except TypeError:
+            pass
+        found = self.problems(value)
+        if not found:
+            return value
+        if len(found) == 1:
+            raise found[0].exception(found[0].message)
+        raise found[0].exception(SCHEMA_ERRORS.format(
+            count=len(found),
+            errors='; '.join(problem.message for problem in found)))
@@ -0,0 +1,96 @@
+import logging
+import signal
+import threading
+from contextlib import contextmanager
+
+from exceptions import ShutdownDeadline, ShutdownRequested
+
+
+SHUTDOWN_DEADLINE = 25
+CLEANUP_DEADLINE = 5
+
+SHUTDOWN_SIGNAL = ('Получен сигнал {signal}: завершаем текущие запросы '
+                   'не дольше {deadline} с')
+SHUTDOWN_TIMEOUT = 'Не успели завершить запросы за {deadline} с'
+
+
+class GracefulShutdown:
+    """Останавливает цикл опроса по SIGTERM/SIGINT, не обрывая отправку.
+
+    Сигнал только выставляет флаг: текущий запрос к API и отправка
+    сообщения доводятся до конца. Прервать можно лишь ожидание между
+    опросами, а если работа не закончилась за `deadline` секунд,
+    SIGALRM обрывает её исключением ShutdownDeadline.
+
+    Завершение после цикла начинается с `disarm`: таймер снимается,
+    чтобы он не оборвал сохранение состояния, а необязательные шаги
+    вроде отправки накопленного получают свой срок через `bounded`.
+    """
+
+    def __init__(self, deadline=SHUTDOWN_DEADLINE):
+        """Остановка со сроком `deadline` секунд на текущую работу."""
+        self.deadline = deadline
+        self.armed = deadline
+        self.requested = threading.Event()
+        self.sleeping = False
+        self.cleaning = False
+        self.previous = {}
+
+    def install(self):
+        """Устанавливает обработчики сигналов остановки."""
+        for signum, handler in ((signal.SIGTERM, self.handle),
+                                (signal.SIGINT, self.handle),
+                                (signal.SIGALRM, self.expire)):
+            self.previous[signum] = signal.signal(signum, handler)
+
+    def restore(self):
+        """Снимает таймер и возвращает прежние обработчики сигналов."""
+        signal.alarm(0)
+        for signum, handler in self.previous.items():
+            signal.signal(signum, handler)
+        self.previous.clear()
+
+    def handle(self, signum, frame):
+        """Обработчик сигнала остановки."""
+        logging.warning(SHUTDOWN_SIGNAL.format(
+            signal=signal.Signals(signum).name, deadline=self.deadline))
+        if not self.requested.is_set():
+            self.requested.set()
+            if not self.cleaning:
+                self.armed = self.deadline
+                signal.alarm(self.deadline)
+        if self.sleeping:
+            raise ShutdownRequested
+
+    def expire(self, signum, frame):
+        """Обработчик SIGALRM: время на остановку вышло."""
+        logging.error(SHUTDOWN_TIMEOUT.format(deadline=self.armed))
+        raise ShutdownDeadline
+
+    def disarm(self):
+        """Снимает таймер остановки перед сохранением состояния."""
+        self.cleaning = True
+        signal.alarm(0)
+
+    @contextmanager
+    def bounded(self, seconds=CLEANUP_DEADLINE):
+        """Шаг завершения, который обрывается через `seconds` секунд."""
+        self.armed = seconds
+        signal.alarm(seconds)
+        try:
+            yield
+        except ShutdownDeadline:
+            pass
+        finally:
+            signal.alarm(0)
+
+    @contextmanager
+    def interruptible(self):
+        """Участок кода, который сигнал остановки может прервать."""
+        self.sleeping = True
+        try:
+            if self.requested.is_set():
+                raise ShutdownRequested
+            yield
+        finally:
+            self.sleeping = False
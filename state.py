@@ -0,0 +1,44 @@
+import json
+import logging
+import os
+
+
+STATE_SAVED = 'Состояние сохранено в {path}'
+STATE_LOAD_ERROR = 'Не удалось прочитать состояние {path}: {error}'
+
+
+def load_json(path):
+    """Читает сохранённый словарь; пустой, если файла нет или он испорчен."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as error:
+        logging.error(STATE_LOAD_ERROR.format(path=path, error=error))
+        return {}
+    if not isinstance(data, dict):
+        logging.error(STATE_LOAD_ERROR.format(path=path, error=type(data)))
+        return {}
+    return data
+
+
+def load_state(path):
+    """Читает сохранённые метки времени подписок."""
+    try:
+        return {name: int(timestamp)
+                for name, timestamp in load_json(path).items()}
+    except (TypeError, ValueError) as error:
+        logging.error(STATE_LOAD_ERROR.format(path=path, error=error))
+        return {}
+
+
+def save_state(path, data):
+    """Атомарно записывает состояние (словарь) на диск."""
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    logging.debug(STATE_SAVED.format(path=path))
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+
+CONFIG_CHECK_PERIOD = 5
+
+CONFIG_LOADED = 'Загружена конфигурация {path}: подписок {count}'
+CONFIG_ERROR = 'Не удалось загрузить конфигурацию {path}: {error}'
+CONFIG_APPLIED = ('Применены изменения подписок: добавлено {added}, '
+                  'удалено {removed}, изменено {changed}')
+SUBSCRIPTION_FIELDS_ERROR = 'Подписка {index}: нет полей {fields}'
+
+REQUIRED_FIELDS = ('name', 'practicum_token', 'chat_id')
+
+Subscription = namedtuple(
+    'Subscription', REQUIRED_FIELDS + ('priority',), defaults=(0,))
+Config = namedtuple('Config', ('settings', 'subscriptions'))
+SubscriptionDiff = namedtuple(
+    'SubscriptionDiff', ('added', 'removed', 'changed', 'settings'))
+
+
+def load_config(path):
+    """Читает настройки и список подписок из JSON-файла."""
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    subscriptions = {}
+    for index, item in enumerate(data.get('subscriptions', [])):
+        missing = [field for field in REQUIRED_FIELDS if field not in item]
+        if missing:
+            raise KeyError(SUBSCRIPTION_FIELDS_ERROR.format(
+                index=index, fields=missing))
+        subscription = Subscription(
+            *(str(item[field]) for field in REQUIRED_FIELDS),
+            priority=int(item.get('priority', 0)))
+        subscriptions[subscription.name] = subscription
+    return Config(data.get('settings', {}), subscriptions)
+
+
+def diff_config(old, new):
+    """Вычисляет разницу между двумя конфигурациями."""
+    added = [new.subscriptions[name] for name in new.subscriptions
+             if name not in old.subscriptions]
+    removed = [name for name in old.subscriptions
+               if name not in new.subscriptions]
+    changed = [new.subscriptions[name] for name in new.subscriptions
+               if name in old.subscriptions
+               and new.subscriptions[name] != old.subscriptions[name]]
+    settings = {key: value for key, value in new.settings.items()
+                if old.settings.get(key) != value}
+    return SubscriptionDiff(added, removed, changed, settings)
+
+
+class SubscriptionRegistry:
+    """Подписки, которые опрашивает бот, и их временные метки."""
+
+    def __init__(self, saved=None):
+        """Пустой реестр; `saved` — метки времени прошлого запуска."""
+        self.lock = threading.Lock()
+        self.config = Config({}, {})
+        self.timestamps = {}
+        self.saved = dict(saved or {})
+
+    def apply(self, config, timestamp):
+        """Применяет новую конфигурацию, не трогая неизменные подписки."""
+        with self.lock:
+            diff = diff_config(self.config, config)
+            for subscription in diff.added:
+                self.timestamps[subscription.name] = self.saved.pop(
+                    subscription.name, timestamp)
+            for name in diff.removed:
+                del self.timestamps[name]
+            self.config = config
+        logging.info(CONFIG_APPLIED.format(
+            added=len(diff.added), removed=len(diff.removed),
+            changed=len(diff.changed)))
+        return diff
+
+    def setting(self, name, default):
+        """Значение настройки из текущей конфигурации."""
+        return self.config.settings.get(name, default)
+
+    def items(self):
+        """Снимок подписок с метками времени для очередного опроса."""
+        with self.lock:
+            return [(subscription, self.timestamps[name])
+                    for name, subscription
+                    in self.config.subscriptions.items()]
+
+    def snapshot(self):
+        """Копия меток времени для сохранения на диск."""
+        with self.lock:
+            return dict(self.timestamps)
+
+    def advance(self, name, timestamp):
+        """Сдвигает метку времени, если подписку не удалили во время опроса."""
+        with self.lock:
+            if name in self.timestamps:
+                self.timestamps[name] = timestamp
+
+
+class ConfigWatcher(threading.Thread):
+    """Перечитывает конфигурацию по SIGHUP или при изменении файла."""
+
+    def __init__(self, path, registry, period=CONFIG_CHECK_PERIOD,
+                 heartbeat=None):
+        """Следит за файлом `path` раз в `period` секунд.
+
+        `heartbeat` вызывается на каждой проверке файла.
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.registry = registry
+        self.period = period
+        self.heartbeat = heartbeat
+        self.mtime = None
+        self.reload_requested = threading.Event()
+
+    def request_reload(self, signum=None, frame=None):
+        """Обработчик SIGHUP: перечитать конфигурацию немедленно."""
+        self.reload_requested.set()
+
+    def reload(self, timestamp):
+        """Загружает файл и применяет изменения к реестру подписок."""
+        try:
+            self.mtime = os.stat(self.path).st_mtime
+            config = load_config(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logging.error(CONFIG_ERROR.format(path=self.path, error=error))
+            return None
+        logging.info(CONFIG_LOADED.format(
+            path=self.path, count=len(config.subscriptions)))
+        return self.registry.apply(config, timestamp)
+
+    def changed(self):
+        """Изменился ли файл конфигурации с последней загрузки."""
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except OSError:
+            return False
+
+    def run(self):
+        """Следит за файлом, пока работает процесс."""
+        while True:
+            self.reload_requested.wait(self.period)
+            if self.heartbeat:
+                self.heartbeat()
+            if self.reload_requested.is_set() or self.changed():
+                self.reload_requested.clear()
+                self.reload(int(time.time()))
@@ -0,0 +1,248 @@
+"""Локальная замена API Практикума и Telegram Bot API для нагрузочных тестов.
+
+Запуск отдельным процессом:
+
+    python tests/fake_server.py --port 8080 --latency 0.2 --error-rate 0.05
+
+и бот, направленный на него:
+
+    PRACTICUM_ENDPOINT=http://127.0.0.1:8080/api/user_api/homework_statuses/
+    TELEGRAM_API_URL=http://127.0.0.1:8080/bot
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HOMEWORKS_PATH = '/api/user_api/homework_statuses/'
+TELEGRAM_PATH = re.compile(r'^/bot(?P<token>[^/]+)/(?P<method>\w+)$')
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+@dataclass
+class FakeSettings:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    refusal_rate: float = 0.0
+    telegram_latency: float = 0.0
+    telegram_throttle_rate: float = 0.0
+    homeworks_per_token: int = 1
+    transition_period: float = 60.0
+    seed: int = None
+    revoked_tokens: tuple = ()
+
+
+@dataclass
+class FakeState:
+    settings: FakeSettings
+    started: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    messages: list = field(default_factory=list)
+    api_requests: int = 0
+    next_message_id: int = 1
+
+    def __post_init__(self):
+        self.random = random.Random(self.settings.seed)
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self, latency):
+        with self.lock:
+            jitter = self.random.uniform(0, self.settings.jitter)
+        if latency or jitter:
+            time.sleep(latency + jitter)
+
+    def homeworks(self, token, from_date):
+        """Домашки, чей статус сменился после from_date.
+
+        Каждая домашка раз в transition_period секунд проходит цепочку
+        reviewing -> approved/rejected -> reviewing, со сдвигом по номеру.
+        """
+        now = time.time()
+        period = self.settings.transition_period
+        homeworks = []
+        for number in range(self.settings.homeworks_per_token):
+            offset = number * period / max(self.settings.homeworks_per_token,
+                                           1)
+            step = int((now - self.started + offset) // period)
+            updated = self.started - offset + step * period
+            if updated < from_date:
+                continue
+            homeworks.append({
+                'id': number,
+                'status': STATUSES[step % len(STATUSES)],
+                'homework_name': f'{token}__hw{number}.zip',
+                'reviewer_comment': '',
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(updated)),
+                'lesson_name': f'Урок {number}',
+            })
+        return homeworks
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == HOMEWORKS_PATH:
+            return self.homework_statuses(parse_qs(url.query))
+        return self.telegram(url.path, parse_qs(url.query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.headers.get('Content-Type', '').startswith(
+                'application/json'):
+            params = json.loads(body or b'{}')
+        else:
+            params = {key: values[0] for key, values
+                      in parse_qs(body.decode()).items()}
+        return self.telegram(urlparse(self.path).path, params)
+
+    def homework_statuses(self, query):
+        state = self.server.state
+        with state.lock:
+            state.api_requests += 1
+        state.delay(state.settings.latency)
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('OAuth ') or authorization in (
+                'OAuth None', *(f'OAuth {token}' for token
+                                in state.settings.revoked_tokens)):
+            return self.send_json(HTTPStatus.UNAUTHORIZED, {
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+                'source': '__response__',
+            })
+        if state.chance(state.settings.error_rate):
+            return self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {})
+        if state.chance(state.settings.refusal_rate):
+            key = 'error' if state.chance(0.5) else 'code'
+            return self.send_json(HTTPStatus.OK, {key: 'fake refusal'})
+        try:
+            from_date = int(query['from_date'][0])
+        except (KeyError, ValueError):
+            return self.send_json(HTTPStatus.BAD_REQUEST, {
+                'error': {'error': 'Wrong from_date format'}})
+        token = authorization[len('OAuth '):]
+        self.send_json(HTTPStatus.OK, {
+            'homeworks': state.homeworks(token, from_date),
+            'current_date': int(time.time()),
+        })
+
+    def telegram(self, path, params):
+        state = self.server.state
+        match = TELEGRAM_PATH.match(path)
+        if not match:
+            return self.send_json(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found'})
+        state.delay(state.settings.telegram_latency)
+        if match['token'] in state.settings.revoked_tokens:
+            return self.send_json(HTTPStatus.UNAUTHORIZED, {
+                'ok': False, 'error_code': 401,
+                'description': 'Unauthorized'})
+        if state.chance(state.settings.telegram_throttle_rate):
+            return self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1}})
+        method = match['method']
+        if method == 'getMe':
+            bot_id = int(match['token'].split(':')[0])
+            return self.send_json(HTTPStatus.OK, {'ok': True, 'result': {
+                'id': bot_id, 'is_bot': True, 'first_name': 'fake'}})
+        if method == 'sendMessage':
+            with state.lock:
+                message_id = state.next_message_id
+                state.next_message_id += 1
+                state.messages.append(dict(params, token=match['token']))
+            return self.send_json(HTTPStatus.OK, {'ok': True, 'result': {
+                'message_id': message_id, 'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'text': params.get('text', '')}})
+        self.send_json(HTTPStatus.OK, {'ok': True, 'result': True})
+
+
+class FakeServer:
+    """Сервер в фоновом потоке; используется как контекстный менеджер."""
+
+    def __init__(self, host='127.0.0.1', port=0, **settings):
+        self.httpd = ThreadingHTTPServer((host, port), FakeHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = FakeState(FakeSettings(**settings))
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def endpoint(self):
+        return self.url + HOMEWORKS_PATH
+
+    @property
+    def telegram_url(self):
+        return self.url + '/bot'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    for name, value in vars(FakeSettings()).items():
+        if name not in ('seed', 'revoked_tokens'):
+            parser.add_argument('--' + name.replace('_', '-'),
+                                type=type(value), default=value)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--revoked-tokens', nargs='*', default=())
+    args = vars(parser.parse_args())
+    server = FakeServer(**args)
+    print(f'Practicum: {server.endpoint}\nTelegram: {server.telegram_url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
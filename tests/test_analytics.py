@@ -0,0 +1,131 @@
+import json
+from types import SimpleNamespace
+
+from analytics import ReviewAnalytics, bucket, bucket_middle
+from leases import LeaseManager
+from outbox import Outbox
+from subscriptions import Subscription
+
+
+MENTOR = Subscription('student', 'token', '42')
+
+
+def homework(name, status, hour):
+    return {'homework_name': name, 'status': status,
+            'date_updated': f'2022-01-01T{hour:02d}:00:00Z'}
+
+
+class TestAnalytics:
+
+    def test_transitions_update_aggregates(self):
+        analytics = ReviewAnalytics(period=3600, now=0)
+        for name, verdict, hours in (('hw1', 'approved', 1),
+                                     ('hw2', 'rejected', 3),
+                                     ('hw3', 'approved', 5)):
+            analytics.update(MENTOR, homework(name, 'reviewing', 0))
+            analytics.update(MENTOR, homework(name, verdict, hours))
+            analytics.update(MENTOR, homework(name, verdict, hours))
+        analytics.update(MENTOR, homework('hw4', 'reviewing', 6))
+        stats = analytics.chats['42']
+        assert (stats.reviewing, stats.taken, stats.approved,
+                stats.rejected) == (1, 4, 2, 1), (
+            'Проверьте, что повтор того же статуса не учитывается дважды.'
+        )
+        median = stats.median()
+        assert median == bucket_middle(bucket(3 * 3600))
+        assert abs(median - 3 * 3600) / (3 * 3600) < 0.2
+
+    def test_digest_resets_period_and_survives_restart(self):
+        analytics = ReviewAnalytics(period=3600, now=0)
+        analytics.update(MENTOR, homework('hw1', 'reviewing', 0))
+        assert not analytics.due(now=3599)
+        assert analytics.due(now=3600)
+        saved = json.loads(json.dumps(analytics.snapshot()))
+
+        restored = ReviewAnalytics(period=3600, saved=saved)
+        digests, started = restored.digests(now=7300)
+        assert started == 3600
+        assert digests[0][0] == '42'
+        assert 'На проверке сейчас: 1' in digests[0][1]
+        assert 'Взято на проверку: 1' in digests[0][1]
+        assert restored.next_digest == 10800
+        stats = restored.chats['42']
+        assert (stats.reviewing, stats.taken) == (1, 0), (
+            'Проверьте, что после сводки счётчики периода сбрасываются, '
+            'а число работ на проверке сохраняется.'
+        )
+
+    def test_digests_are_queued_once(self, homework_module):
+        analytics = ReviewAnalytics(period=3600, now=0)
+        analytics.update(MENTOR, homework('hw1', 'reviewing', 0))
+        analytics.next_digest = 0
+        outbox = Outbox()
+        homework_module.send_digests(outbox, analytics)
+        homework_module.send_digests(outbox, analytics)
+        assert [item.chat_id for item in outbox.queue()] == ['42']
+
+    def test_digest_only_skips_individual_messages(
+            self, homework_module, monkeypatch):
+        monkeypatch.setattr(homework_module, 'DIGEST_ONLY', '1')
+        analytics = ReviewAnalytics()
+        outbox = Outbox()
+        notify = homework_module.notifier(outbox, analytics=analytics)
+        notify(MENTOR, homework('hw1', 'reviewing', 0), 'сообщение')
+        assert len(outbox) == 0
+        assert analytics.chats['42'].reviewing == 1
+
+    def test_finished_works_are_evicted(self):
+        analytics = ReviewAnalytics(period=3600, now=0)
+        analytics.update(MENTOR, homework('hw1', 'reviewing', 0))
+        analytics.update(MENTOR, homework('hw1', 'approved', 1))
+        analytics.update(MENTOR, homework('hw2', 'reviewing', 2))
+        analytics.update(MENTOR, homework('hw3', 'rejected', 5))
+        at = {name: at for (_, name), (_, at, _) in analytics.works.items()}
+        analytics.evict({'student': at['hw2'] + 3600})
+        assert sorted(name for _, name in analytics.works) == [
+            'hw2', 'hw3'], (
+            'Проверьте, что работы с вердиктом забываются, когда метка '
+            'времени подписки ушла дальше их даты.'
+        )
+        analytics.evict({})
+        assert not analytics.works, (
+            'Проверьте, что работы удалённой подписки забываются все, '
+            'включая стоящие на проверке.'
+        )
+        assert analytics.chats['42'].reviewing == 0
+        assert analytics.chats['42'].approved == 1
+
+    def test_nodes_send_one_digest_per_chat(self, homework_module, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        keepers, outbox = [], Outbox()
+        for node, (name, work) in (('first', ('student', 'hw1')),
+                                   ('second', ('other', 'hw2'))):
+            leases = LeaseManager(path, node)
+            leases.rebalance([name])
+            analytics = ReviewAnalytics(period=3600, now=0)
+            analytics.update(Subscription(name, 'token', '42'),
+                             homework(work, 'reviewing', 0))
+            analytics.next_digest = 0
+            keeper = SimpleNamespace(leases=leases, analytics=analytics)
+            keepers.append(keeper)
+            homework_module.share_analytics(keeper, analytics)
+        keepers[1].leases.claim(homework_module.DIGEST_ROLE)
+        for keeper in keepers:
+            homework_module.send_digests(outbox, keeper.analytics, keeper)
+        digests = outbox.queue()
+        assert [item.chat_id for item in digests] == ['42'], (
+            'Проверьте, что с арендой подписок сводку в чат отправляет '
+            'только один узел.'
+        )
+        assert 'На проверке сейчас: 2' in digests[0].text
+        assert 'Взято на проверку: 2' in digests[0].text
+
+    def test_moved_subscription_leaves_reviewing(self, homework_module):
+        analytics = ReviewAnalytics(period=3600, now=0)
+        analytics.update(MENTOR, homework('hw1', 'reviewing', 0))
+        keeper = SimpleNamespace(leases=SimpleNamespace(owned=frozenset()))
+        homework_module.evict_works(analytics, {'student': 0}, keeper)
+        assert not analytics.works and analytics.chats['42'].reviewing == 0, (
+            'Проверьте, что узел забывает работы подписок, ушедших '
+            'к другому узлу.'
+        )
@@ -0,0 +1,120 @@
+import functools
+import itertools
+
+import requests
+import telegram
+
+import utils
+from backpressure import NORMAL, PAUSED, SHEDDING, Backpressure
+from bot_pool import BotPool
+from outbox import Outbox
+from shutdown import GracefulShutdown
+from subscriptions import Config, Subscription, SubscriptionRegistry
+
+
+def approved_batches():
+    """Ответы API: на каждый запрос три новые принятые работы."""
+    dates = itertools.count(1)
+
+    def answer(token, from_date):
+        date = next(dates)
+        return {
+            'homeworks': [{'homework_name': f'hw{date}-{number}',
+                           'status': 'approved'}
+                          for number in range(3)],
+            'current_date': date,
+        }
+    return answer
+
+
+class BlockedChatBot(utils.MockTelegramBot):
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if chat_id == 'blocked':
+            raise telegram.error.Unauthorized(
+                'Forbidden: bot was blocked by the user')
+        super().send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+class TestBackpressure:
+
+    def test_watermarks_have_hysteresis(self):
+        queue = []
+        backpressure = Backpressure(queue, capacity=10, high=0.8, low=0.5)
+        low = Subscription('low', 'token', '1')
+        high = Subscription('high', 'token', '1', priority=1)
+        queue.extend(range(8))
+        assert backpressure.observe() == SHEDDING
+        assert not backpressure.admit(low)
+        assert backpressure.admit(high)
+        queue.extend(range(2))
+        assert backpressure.observe() == PAUSED
+        assert not backpressure.admit(high)
+        del queue[6:]
+        assert backpressure.observe() == SHEDDING, (
+            'Проверьте, что опрос не возобновляется, пока очередь '
+            'не опустится ниже нижней отметки.'
+        )
+        del queue[5:]
+        assert backpressure.observe() == NORMAL
+        stats = backpressure.report()
+        assert stats['peak'] == 10
+        assert stats['skipped'] == 2
+
+    def test_queue_stays_bounded_while_delivery_stalls(
+            self, monkeypatch, homework_module):
+        monkeypatch.setattr(requests, 'get',
+                            utils.mock_homework_api(approved_batches()))
+        subscriptions = {
+            name: Subscription(name, name, name, priority=int(
+                name == 'vip'))
+            for name in ('vip', 'a', 'b', 'c')
+        }
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, subscriptions), 0)
+        pool = BotPool()
+        pool.add('1:token', utils.MockTelegramBot())
+        outbox = Outbox()
+        backpressure = Backpressure(outbox, capacity=30)
+        admit = homework_module.admission(backpressure=backpressure)
+        for _ in range(50):
+            homework_module.poll_all(
+                pool, functools.partial(homework_module.enqueue, outbox),
+                registry, GracefulShutdown(), admit=admit)
+        assert len(outbox) < 30 + 3, (
+            'Проверьте, что очередь отправки не растёт больше ёмкости, '
+            'пока отправка стоит.'
+        )
+        chats = [item.chat_id for item in outbox.queue()]
+        assert chats.count('vip') > chats.count('a'), (
+            'Проверьте, что при заполнении очереди первыми '
+            'откладываются подписки с низким приоритетом.'
+        )
+        assert backpressure.report()['skipped'] > 0
+
+    def test_blocked_chat_does_not_pause_polling(
+            self, monkeypatch, homework_module):
+        monkeypatch.setattr(requests, 'get',
+                            utils.mock_homework_api(approved_batches()))
+        subscriptions = {name: Subscription(name, name, name)
+                         for name in ('blocked', 'a', 'b')}
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, subscriptions), 0)
+        pool = BotPool()
+        pool.add('1:token', BlockedChatBot()).interval = 0
+        outbox = Outbox()
+        backpressure = Backpressure(outbox, capacity=30)
+        admit = homework_module.admission(backpressure=backpressure)
+        for _ in range(20):
+            homework_module.poll_all(
+                pool, functools.partial(homework_module.enqueue, outbox),
+                registry, GracefulShutdown(), admit=admit)
+            backpressure.observe()
+            pool.drain(outbox, homework_module.deliver)
+        stats = backpressure.report()
+        assert stats['mode'] == NORMAL and stats['skipped'] == 0, (
+            'Проверьте, что чат, куда нельзя доставить уведомления, '
+            'не заполняет очередь и не останавливает опрос остальных.'
+        )
+        assert len(outbox) == 0
+        assert outbox.dead == 20 * 3
@@ -0,0 +1,167 @@
+import time
+from types import SimpleNamespace
+
+import telegram
+
+import board
+from board import Board, BoardManager
+from shutdown import GracefulShutdown
+from subscriptions import Subscription
+
+
+VERDICTS = {'approved': 'принята', 'reviewing': 'на проверке'}
+SUBSCRIPTION = Subscription('student', 'token', '1')
+
+
+class BoardBot:
+
+    def __init__(self, edit_error=None):
+        self.edit_error = edit_error
+        self.sent = []
+        self.edited = []
+        self.pinned = []
+
+    def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+
+    def edit_message_text(self, chat_id, message_id, text):
+        if self.edit_error:
+            raise telegram.error.BadRequest(self.edit_error)
+        self.edited.append((chat_id, message_id, text))
+
+    def pin_chat_message(self, chat_id, message_id, disable_notification):
+        self.pinned.append((chat_id, message_id))
+
+
+def homework(name, status):
+    return {'homework_name': name, 'status': status}
+
+
+class TestBoard:
+
+    def test_changes_are_debounced_into_one_edit(self):
+        bot = BoardBot()
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=60)
+        boards.update(SUBSCRIPTION, homework('hw1', 'reviewing'))
+        boards.update(SUBSCRIPTION, homework('hw2', 'reviewing'))
+        boards.flush()
+        assert bot.sent == [], (
+            'Проверьте, что доска не обновляется, пока изменения '
+            'продолжают поступать.'
+        )
+        boards.flush(force=True)
+        assert len(bot.sent) == 1
+        assert bot.pinned == [('1', 1)]
+        assert 'hw1: на проверке' in bot.sent[0][1]
+        assert 'hw2: на проверке' in bot.sent[0][1]
+
+        boards.update(SUBSCRIPTION, homework('hw1', 'approved'))
+        boards.flush(force=True)
+        assert len(bot.sent) == 1
+        assert bot.edited[-1][:2] == ('1', 1)
+        assert 'hw1: принята' in bot.edited[-1][2]
+
+    def test_unchanged_text_is_not_edited(self):
+        bot = BoardBot()
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=0)
+        boards.update(SUBSCRIPTION, homework('hw1', 'approved'))
+        boards.flush()
+        boards.update(SUBSCRIPTION, homework('hw1', 'reviewing'))
+        boards.update(SUBSCRIPTION, homework('hw1', 'approved'))
+        boards.flush()
+        assert bot.edited == [], (
+            'Проверьте, что правка с тем же текстом не отправляется.'
+        )
+
+    def test_not_modified_error_is_ignored(self):
+        bot = BoardBot(edit_error='Bad Request: message is not modified')
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=0,
+                              saved={'1': {'statuses': {}, 'message_id': 7,
+                                           'rendered': 'старый текст'}})
+        boards.flush()
+        assert bot.sent == []
+        assert boards.due() == []
+
+    def test_deleted_message_is_recreated_after_restore(self):
+        bot = BoardBot(edit_error='Bad Request: message to edit not found')
+        saved = BoardManager(VERDICTS, None)
+        saved.update(SUBSCRIPTION, homework('hw1', 'approved'))
+        snapshot = saved.snapshot()
+        snapshot['1']['message_id'] = 7
+
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=0,
+                              saved=snapshot)
+        boards.flush()
+        assert len(bot.sent) == 1, (
+            'Проверьте, что доска восстанавливается после перезапуска '
+            'и создаётся заново, если сообщение удалено.'
+        )
+        assert boards.snapshot()['1']['message_id'] == 1
+
+    def test_failing_board_backs_off(self):
+        class FlakyBot(BoardBot):
+            def send_message(self, chat_id, text):
+                self.sent.append((chat_id, text))
+                raise telegram.error.NetworkError('connection reset')
+
+        bot = FlakyBot()
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=0)
+        boards.update(SUBSCRIPTION, homework('hw1', 'approved'))
+        for _ in range(5):
+            boards.flush()
+        assert len(bot.sent) == 1, (
+            'Проверьте, что доска после ошибки ждёт повтора, а не '
+            'отправляется на каждом проходе.'
+        )
+        boards.boards['1'].retry_at = 0.0
+        boards.flush()
+        assert len(bot.sent) == 2
+        assert boards.boards['1'].failures == 2
+
+    def test_board_keeps_statuses_after_permanent_error(self):
+        bot = BoardBot(edit_error='Bad Request: chat not found')
+        statuses = {'hw.zip': 'approved'}
+        boards = BoardManager(VERDICTS, lambda chat_id: bot, debounce=0,
+                              saved={'1': {'statuses': statuses,
+                                           'message_id': 7,
+                                           'rendered': 'старый текст'}})
+        boards.flush()
+        assert boards.snapshot() == {'1': {
+            'statuses': statuses, 'message_id': None, 'rendered': None}}, (
+            'Проверьте, что после постоянной ошибки доска хранит статусы '
+            'и забывает только сообщение.'
+        )
+
+    def test_long_board_fits_one_message(self):
+        statuses = {f'{"работа" * 10}_{index}.zip': 'reviewing'
+                    for index in range(200)}
+        boards = BoardManager(VERDICTS, lambda chat_id: BoardBot())
+        text = boards.render(Board(statuses))
+        assert len(text) <= board.MAX_LENGTH, (
+            'Проверьте, что доска не длиннее одного сообщения Telegram.'
+        )
+        shown = text.count('\n') - 1
+        assert text.endswith(
+            board.BOARD_MORE.format(count=len(statuses) - shown)), (
+            'Проверьте, что доска сообщает, сколько работ не поместилось.'
+        )
+
+    def test_stop_is_bounded(self, monkeypatch, homework_module):
+        class HangingBot(BoardBot):
+            def send_message(self, chat_id, text):
+                time.sleep(10)
+
+        monkeypatch.setattr(homework_module, 'BOARD_FLUSH_DEADLINE', 1)
+        boards = BoardManager(VERDICTS, lambda chat_id: HangingBot())
+        boards.update(SUBSCRIPTION, homework('hw1', 'reviewing'))
+        shutdown = GracefulShutdown()
+        shutdown.install()
+        started = time.monotonic()
+        try:
+            homework_module.stop_boards(boards, shutdown)
+        finally:
+            shutdown.restore()
+        assert time.monotonic() - started < 5, (
+            'Проверьте, что вывод досок при остановке ограничен по времени.'
+        )
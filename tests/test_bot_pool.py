@@ -0,0 +1,87 @@
+import pytest
+import telegram
+
+import utils
+from bot_pool import BotPool
+from fake_server import FakeServer
+from outbox import Outbox
+
+
+class ThrottledBot(utils.MockTelegramBot):
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        raise telegram.error.RetryAfter(60)
+
+
+def make_pool(count):
+    pool = BotPool()
+    for number in range(count):
+        pool.add(f'{number}:token', utils.MockTelegramBot())
+    return pool
+
+
+class TestBotPool:
+    CHATS = [str(chat) for chat in range(1000)]
+
+    def test_assignment_is_stable_and_balanced(self):
+        pool = make_pool(4)
+        owners = {chat: pool.bot_for(chat).id for chat in self.CHATS}
+        same_pool = make_pool(4)
+        assert owners == {chat: same_pool.bot_for(chat).id
+                          for chat in self.CHATS}, (
+            'Проверьте, что чат всегда обслуживает один и тот же бот.'
+        )
+        for token_id in pool.bots:
+            share = list(owners.values()).count(token_id) / len(self.CHATS)
+            assert 0.1 < share < 0.4
+
+    def test_rebalance_moves_only_removed_bot_chats(self):
+        pool = make_pool(4)
+        before = {chat: pool.bot_for(chat).id for chat in self.CHATS}
+        pool.remove('3:token')
+        moved = [chat for chat in self.CHATS
+                 if pool.bot_for(chat).id != before[chat]]
+        assert moved and all(before[chat] == '3' for chat in moved), (
+            'Проверьте, что при удалении бота переезжают только его чаты.'
+        )
+
+    def test_drain_uses_every_bot(self, homework_module):
+        pool = make_pool(3)
+        outbox = Outbox()
+        for chat in self.CHATS[:30]:
+            outbox.put(chat, chat, 'текст')
+        assert pool.drain(outbox, homework_module.deliver) == 30
+        assert len(outbox) == 0
+        assert all(bot.sent > 0 for bot in pool.bots.values())
+
+    def test_throttled_bot_is_reported(self, homework_module):
+        pool = BotPool()
+        bot = pool.add('1:token', ThrottledBot())
+        outbox = Outbox()
+        outbox.put('k1', '1', 'текст')
+        assert pool.drain(outbox, homework_module.deliver) == 0
+        assert bot.throttled == 1
+        with pytest.raises(telegram.error.RetryAfter):
+            bot.send_message(chat_id='1', text='текст')
+
+    def test_revoked_bot_leaves_pool_without_losing_messages(
+            self, homework_module):
+        with FakeServer(revoked_tokens=('222:revoked',)) as server:
+            pool = BotPool(base_url=server.telegram_url)
+            pool.add('111:token')
+            pool.add('222:revoked')
+            outbox = Outbox()
+            for chat in self.CHATS[:20]:
+                outbox.put(chat, chat, 'текст')
+            pool.drain(outbox, homework_module.deliver)
+            assert list(pool.bots) == ['111'], (
+                'Проверьте, что бот с отозванным токеном выводится из пула.'
+            )
+            assert outbox.dead == 0
+            pool.drain(outbox, homework_module.deliver)
+            pool.sync(['111:token', '222:revoked'])
+            assert list(pool.bots) == ['111']
+        assert len(outbox) == 0, (
+            'Проверьте, что уведомления бота с отозванным токеном '
+            'уходят через других ботов.'
+        )
+        assert len(server.state.messages) == 20
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+import requests
+
+import utils
+from codec import STDLIB, ResponseCodec, available
+
+
+PAYLOAD = {
+    'homeworks': [{'homework_name': 'hw.zip', 'status': 'approved',
+                   'reviewer_comment': 'Всё отлично'}],
+    'current_date': 1644764457,
+}
+
+
+def make_response(payload):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(payload, ensure_ascii=False).encode()
+    return response
+
+
+class TestCodec:
+
+    @pytest.mark.parametrize('name', list(available()))
+    def test_decoders_agree(self, name):
+        assert ResponseCodec(name).decode(make_response(PAYLOAD)) == PAYLOAD
+
+    def test_auto_prefers_fast_decoder(self):
+        assert ResponseCodec().name == next(iter(available()))
+
+    def test_missing_decoder_falls_back_to_stdlib(self):
+        assert ResponseCodec('no-such-decoder').name == STDLIB
+
+    def test_response_without_content_uses_json(self):
+        response = utils.MockResponseGET(random_timestamp=1)
+        assert ResponseCodec().decode(response) == {
+            'homeworks': [], 'current_date': 1}
+
+    def test_invalid_json_raises_value_error(self):
+        response = requests.Response()
+        response._content = b'<html>'
+        for name in available():
+            with pytest.raises(ValueError):
+                ResponseCodec(name).decode(response)
@@ -0,0 +1,133 @@
+import time
+from types import SimpleNamespace
+
+import requests
+
+import utils
+from bot_pool import BotPool
+from commands import CommandServer, StatusCache
+from shutdown import GracefulShutdown
+from subscriptions import Config, Subscription, SubscriptionRegistry
+
+
+VERDICTS = {'approved': 'принята', 'reviewing': 'на проверке'}
+STUDENT = Subscription('student', 'token', '42')
+
+
+def update(update_id, chat_id, text):
+    return SimpleNamespace(update_id=update_id, message=SimpleNamespace(
+        chat_id=chat_id, text=text))
+
+
+class CommandBot:
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.offsets = []
+        self.sent = []
+
+    def get_updates(self, offset=None, **kwargs):
+        self.offsets.append(offset)
+        return self.batches.pop(0) if self.batches else []
+
+    def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+class TestCommands:
+
+    def test_cache_merges_responses_and_reports_staleness(self):
+        cache = StatusCache(VERDICTS, stale_after=600)
+        cache.observe(STUDENT, [{'homework_name': 'hw1',
+                                 'status': 'reviewing'}])
+        cache.observe(STUDENT, [{'homework_name': 'hw2',
+                                 'status': 'approved',
+                                 'date_updated': '2022-01-01T00:00:00Z'}])
+        checked_at = cache.entries['student'].checked_at
+        homeworks = cache.homeworks(42, now=checked_at + 60)
+        assert 'hw1: на проверке' in homeworks
+        assert 'hw2: принята (2022-01-01T00:00:00Z)' in homeworks, (
+            'Проверьте, что кэш хранит последние статусы всех работ, '
+            'а не только из последнего ответа.'
+        )
+        assert 'устарели' not in cache.status(42, now=checked_at + 60)
+        assert 'устарели' in cache.status(42, now=checked_at + 3600)
+        assert 'не подписан' in cache.status(7)
+
+        restored = StatusCache(VERDICTS, saved=cache.snapshot())
+        assert restored.entries == cache.entries
+
+    def test_batch_is_answered_once_per_chat_and_command(self):
+        cache = StatusCache(VERDICTS)
+        cache.observe(STUDENT, [])
+        bot = CommandBot([[
+            update(10, 42, '/status'),
+            update(11, 42, '/status@homework_bot'),
+            update(12, 42, '/homeworks'),
+            update(13, 7, 'привет'),
+            SimpleNamespace(update_id=14, message=None),
+        ]])
+        server = CommandServer(bot, cache)
+        assert server.poll() == 5
+        assert [chat_id for chat_id, _ in bot.sent] == [42, 42]
+        assert server.poll() == 0
+        assert bot.offsets == [None, 15], (
+            'Проверьте, что обработанные обновления подтверждаются '
+            'смещением.'
+        )
+
+    def test_cache_merges_newer_entries(self):
+        cache = StatusCache(VERDICTS)
+        cache.observe(STUDENT, [{'homework_name': 'hw1',
+                                 'status': 'reviewing'}])
+        checked_at = cache.entries['student'].checked_at
+        cache.merge({
+            'student': [checked_at - 60, {'hw1': ['approved', None]}],
+            'other': [checked_at, {'hw2': ['approved', None]}],
+        })
+        assert cache.entries['student'].homeworks == {
+            'hw1': ['reviewing', None]}, (
+            'Проверьте, что запись другого узла не затирает более свежую.'
+        )
+        assert 'other' in cache.entries
+
+    def test_standby_server_does_not_poll(self):
+        cache = StatusCache(VERDICTS)
+        bot = CommandBot([[update(10, 42, '/status')]])
+        server = CommandServer(bot, cache, active=lambda: False)
+        server.start()
+        time.sleep(0.1)
+        server.stopped.set()
+        server.join(1)
+        assert bot.offsets == [], (
+            'Проверьте, что узел без роли команд не вызывает getUpdates.'
+        )
+
+    def test_commands_do_not_call_practicum(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(requests, 'get',
+                            lambda *args, **kwargs: calls.append(args))
+        cache = StatusCache(VERDICTS)
+        cache.register([STUDENT])
+        bot = CommandBot([[update(number, 42, '/status')
+                           for number in range(1000)]])
+        CommandServer(bot, cache).poll()
+        assert calls == []
+        assert bot.sent == [(42, 'Подписка «student»: API ещё не '
+                                 'опрашивался.')]
+
+    def test_poll_fills_cache(self, monkeypatch, homework_module):
+        monkeypatch.setattr(requests, 'get', utils.mock_homework_api({
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 1,
+        }))
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, {STUDENT.name: STUDENT}), 0)
+        pool = BotPool()
+        pool.add('1:token', utils.MockTelegramBot())
+        cache = StatusCache(VERDICTS)
+        homework_module.poll_all(pool, lambda *args: None, registry,
+                                 GracefulShutdown(), observe=cache.observe)
+        assert 'hw1: принята' in cache.homeworks(42), (
+            'Проверьте, что цикл опроса обновляет кэш статусов.'
+        )
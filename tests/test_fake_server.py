@@ -0,0 +1,46 @@
+import requests
+import telegram
+
+from fake_server import FakeServer
+
+
+class TestFakeServer:
+
+    def test_homework_statuses(self, monkeypatch, homework_module):
+        with FakeServer(homeworks_per_token=3) as server:
+            monkeypatch.setattr(homework_module, 'ENDPOINT', server.endpoint)
+            monkeypatch.setattr(homework_module, 'HEADERS',
+                                {'Authorization': 'OAuth token'})
+            response = homework_module.get_api_answer(0)
+            homeworks = homework_module.check_response(response)
+            assert len(homeworks) == 3
+            for homework in homeworks:
+                homework_module.parse_status(homework)
+            assert server.state.api_requests == 1
+
+    def test_errors(self, monkeypatch, homework_module):
+        with FakeServer(error_rate=1.0) as server:
+            monkeypatch.setattr(homework_module, 'ENDPOINT', server.endpoint)
+            response = requests.get(server.endpoint,
+                                    params={'from_date': 0})
+            assert response.status_code == 401, (
+                'Проверьте, что без токена сервер отвечает 401.'
+            )
+            monkeypatch.setattr(homework_module, 'HEADERS',
+                                {'Authorization': 'OAuth token'})
+            try:
+                homework_module.get_api_answer(0)
+            except homework_module.StatusCodeError:
+                pass
+            else:
+                raise AssertionError('Ожидалась ошибка StatusCodeError.')
+
+    def test_telegram_send_message(self, monkeypatch, homework_module):
+        with FakeServer() as server:
+            bot = telegram.Bot(token='1234:abcdefg',
+                               base_url=server.telegram_url)
+            monkeypatch.setattr(homework_module, 'TELEGRAM_CHAT_ID', '42')
+            assert homework_module.send_message(bot, 'Привет')
+            assert server.state.messages == [{
+                'chat_id': '42', 'text': 'Привет', 'token': '1234:abcdefg'
+            }]
@@ -0,0 +1,59 @@
+import itertools
+import time
+
+import requests
+
+from latency import (DEFAULT_TIMEOUT, MIN_TIMEOUT, AdaptiveClient,
+                     HedgeBudget, LatencyTracker)
+
+
+class TestLatency:
+
+    def test_timeout_follows_recent_latency(self):
+        tracker = LatencyTracker()
+        assert tracker.timeout() == DEFAULT_TIMEOUT
+        for _ in range(100):
+            tracker.record(0.1)
+        assert tracker.timeout() == MIN_TIMEOUT
+        for _ in range(100):
+            tracker.record(5)
+        assert tracker.timeout() == 15, (
+            'Проверьте, что таймаут выводится из недавнего p99.'
+        )
+
+    def test_budget_limits_hedges(self):
+        budget = HedgeBudget(ratio=0.05)
+        hedges = 0
+        for _ in range(1000):
+            budget.on_request()
+            hedges += budget.try_spend()
+        assert hedges <= 50, (
+            'Проверьте, что дублей не больше заданной доли запросов.'
+        )
+
+    def test_hedge_returns_fastest_answer(self, monkeypatch):
+        calls = itertools.count()
+
+        def mock_get(url, timeout=None, **kwargs):
+            if next(calls) == 0:
+                time.sleep(1)
+                return 'slow'
+            return 'fast'
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        client = AdaptiveClient(hedge=True, budget=1)
+        for _ in range(50):
+            client.tracker('url').record(0.01)
+        started = time.monotonic()
+        assert client.get('url') == 'fast'
+        assert time.monotonic() - started < 0.5
+        assert client.budget.hedges == 1
+
+    def test_without_hedging_single_request(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(requests, 'get',
+                            lambda **kwargs: calls.append(kwargs) or 'ok')
+        client = AdaptiveClient()
+        assert client.get('url', params={'from_date': 0}) == 'ok'
+        assert calls == [{'url': 'url', 'params': {'from_date': 0},
+                          'timeout': DEFAULT_TIMEOUT}]
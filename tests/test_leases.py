@@ -0,0 +1,108 @@
+from leases import LeaseManager
+
+
+NAMES = [f'student{number}' for number in range(10)]
+
+
+class TestLeases:
+
+    def test_nodes_split_subscriptions(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        first.rebalance(NAMES, now=100)
+        assert len(first.owned) == 10
+        second.rebalance(NAMES, now=101)
+        first.rebalance(NAMES, now=102)
+        second.rebalance(NAMES, now=103)
+        assert len(first.owned) == 5 and not second.owned, (
+            'Проверьте, что лишние подписки отдаются только вместе '
+            'с сохранённым прогрессом.'
+        )
+        first.save_progress({})
+        second.rebalance(NAMES, now=104)
+        assert len(first.owned) == len(second.owned) == 5
+        assert not first.owned & second.owned, (
+            'Проверьте, что у каждой подписки ровно один владелец.'
+        )
+
+    def test_dead_node_subscriptions_are_taken_over(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        first.rebalance(NAMES, now=100)
+        second.rebalance(NAMES, now=101)
+        first.rebalance(NAMES, now=102)
+        first.save_progress({name: 555 for name in first.owned})
+        acquired = second.rebalance(NAMES, now=140)
+        assert len(second.owned) == 10, (
+            'Проверьте, что подписки умершего узла переходят живым '
+            'после истечения аренды.'
+        )
+        assert {acquired[name] for name in first.owned} == {555}
+        assert not first.owns(NAMES[0], now=140)
+
+    def test_released_subscription_keeps_progress(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        first.rebalance(NAMES, now=100)
+        second.rebalance(NAMES, now=101)
+        first.rebalance(NAMES, now=102)
+        released = first.releasing
+        assert len(released) == 5
+        assert not any(first.owns(name, now=102) for name in released), (
+            'Проверьте, что отдаваемые подписки больше не опрашиваются.'
+        )
+        first.save_progress({name: 777 for name in NAMES})
+        acquired = second.rebalance(NAMES, now=103)
+        assert acquired == {name: 777 for name in released}, (
+            'Проверьте, что прогресс отдаваемой подписки сохраняется '
+            'до того, как её заберёт другой узел.'
+        )
+
+    def test_release_all(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        first.rebalance(NAMES, now=100)
+        second.rebalance(NAMES, now=101)
+        first.release_all()
+        second.rebalance(NAMES, now=102)
+        assert len(second.owned) == 10
+
+    def test_role_has_single_holder(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        assert first.claim('commands', now=100)
+        assert not second.claim('commands', now=101), (
+            'Проверьте, что роль одновременно держит только один узел.'
+        )
+        assert first.claim('commands', now=110)
+        assert first.holds('commands', now=120)
+        assert second.claim('commands', now=141)
+        assert not first.claim('commands', now=142)
+        assert not first.holds('commands', now=142)
+        second.release_all()
+        assert first.claim('commands', now=143)
+
+    def test_statuses_are_shared_by_owners(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = LeaseManager(path, 'first', ttl=30)
+        second = LeaseManager(path, 'second', ttl=30)
+        first.rebalance(NAMES[:2], now=100)
+        second.rebalance(NAMES[:2], now=101)
+        first.rebalance(NAMES[:2], now=102)
+        first.save_progress({})
+        second.rebalance(NAMES[:2], now=103)
+        for node in (first, second):
+            node.save_statuses({name: [node.renewed_at, {'hw': [node.node]}]
+                                for name in NAMES[:2]})
+        statuses = first.load_statuses()
+        assert {name: homeworks['hw'][0]
+                for name, (_, homeworks) in statuses.items()} == {
+            name: 'first' if name in first.owned else 'second'
+            for name in NAMES[:2]}, (
+            'Проверьте, что узел публикует статусы только своих подписок.'
+        )
@@ -0,0 +1,111 @@
+import contextvars
+import logging
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import utils
+from bot_pool import BotPool
+from exceptions import CallAbandoned
+from liveness import Watchdog
+from shutdown import GracefulShutdown
+from subscriptions import Config, Subscription, SubscriptionRegistry
+
+
+VARIABLE = contextvars.ContextVar('variable', default=None)
+
+
+def make_module(release):
+    module = types.ModuleType('fake_calls')
+
+    def hang(value):
+        release.wait(5)
+        return value
+
+    def context():
+        return VARIABLE.get()
+
+    module.hang = hang
+    module.send = hang
+    module.context = context
+    return module
+
+
+class TestLiveness:
+
+    def test_stuck_call_is_abandoned_and_dumped(self, caplog):
+        release = threading.Event()
+        module = make_module(release)
+        watchdog = Watchdog(module, {'hang': 0.1, 'send': 0.1,
+                                     'context': 1}, {'send': False})
+        watchdog.enable()
+        try:
+            with pytest.raises(CallAbandoned):
+                module.hang(1)
+            assert module.send(1) is False, (
+                'Проверьте, что для брошенного вызова возвращается '
+                'запасное значение, если оно задано.'
+            )
+            with caplog.at_level(logging.ERROR):
+                watchdog.check()
+            assert 'in hang' in caplog.text, (
+                'Проверьте, что в лог выводится стек зависшего вызова.'
+            )
+            health = watchdog.health()
+            assert health['abandoned'] == 2
+            assert health['stuck_calls'] == ['hang', 'send']
+            assert health['ok']
+
+            VARIABLE.set('subscription')
+            assert module.context() == 'subscription', (
+                'Проверьте, что вызов в потоке сторожа видит контекст '
+                'вызывающего.'
+            )
+        finally:
+            release.set()
+            watchdog.disable()
+        assert module.hang(2) == 2
+
+    def test_health_endpoint_reports_stalled_loop(self):
+        watchdog = Watchdog(types.ModuleType('empty'), {}).enable(port=0)
+        try:
+            url = 'http://127.0.0.1:{}/health'.format(
+                watchdog.server.server_address[1])
+            watchdog.beat('main', 60)
+            assert requests.get(url).status_code == 200
+            watchdog.beat('main', -1)
+            response = requests.get(url)
+            assert response.status_code == 503, (
+                'Проверьте, что проверка живости отвечает 503, пока цикл '
+                'не продвигается.'
+            )
+            assert 'main' in response.json()['stalled']
+        finally:
+            watchdog.disable()
+
+    def test_long_round_keeps_main_loop_alive(self, monkeypatch,
+                                              homework_module):
+        monkeypatch.setattr(requests, 'get', utils.mock_homework_api(
+            {'homeworks': [], 'current_date': 1}, delay=0.03))
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, {
+            str(number): Subscription(str(number), 'token', '1')
+            for number in range(10)}), 0)
+        pool = BotPool()
+        pool.add('1:token', utils.MockTelegramBot())
+        watchdog = Watchdog(types.ModuleType('empty'), {})
+        watchdog.beat('main', 0.1)
+        with ThreadPoolExecutor(2, thread_name_prefix='poll') as executor:
+            homework_module.poll_all(pool, lambda *args: None, registry,
+                                     GracefulShutdown(), executor,
+                                     watchdog=watchdog)
+        loops, _ = watchdog.stuck()
+        assert loops == {}, (
+            'Проверьте, что каждый опрос продвигает главный цикл, '
+            'а завершённые опросы снимаются с наблюдения.'
+        )
+        assert list(watchdog.loops) == ['main']
+        assert watchdog.loops['main'][2] == threading.get_ident()
@@ -0,0 +1,151 @@
+import time
+
+import pytest
+import telegram
+
+import outbox as outbox_module
+from exceptions import BotRevoked, Undeliverable
+from outbox import Notification, Outbox
+
+
+class TestOutbox:
+
+    def test_unacked_notifications_survive_restart(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        outbox = Outbox(path)
+        outbox.put('k1', '1', 'первое')
+        outbox.put('k2', '1', 'второе')
+        outbox.commit()
+        outbox.ack('k1')
+        outbox.commit()
+
+        restored = Outbox(path)
+        assert list(restored.pending) == ['k2'], (
+            'Проверьте, что после перезапуска отправляются только '
+            'неподтверждённые уведомления.'
+        )
+        assert not restored.put('k1', '1', 'первое'), (
+            'Проверьте, что доставленное уведомление не ставится повторно.'
+        )
+
+    def test_duplicate_key_is_skipped(self):
+        outbox = Outbox()
+        assert outbox.put('k1', '1', 'текст')
+        assert not outbox.put('k1', '1', 'текст')
+        assert len(outbox) == 1
+
+    def test_group_commit_uses_one_fsync(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(outbox_module.os, 'fsync',
+                            lambda fd: calls.append(fd))
+        outbox = Outbox(tmp_path / 'outbox.jsonl')
+        for number in range(100):
+            outbox.put(f'k{number}', '1', 'текст')
+        assert calls == []
+        outbox.commit()
+        assert len(calls) == 1
+
+    def test_drain_keeps_order_within_chat(self):
+        outbox = Outbox()
+        outbox.put('a1', 'a', 'a1')
+        outbox.put('b1', 'b', 'b1')
+        outbox.put('a2', 'a', 'a2')
+        sent = []
+
+        def send(notification):
+            if notification.key == 'a1':
+                return False
+            sent.append(notification.key)
+            return True
+
+        assert outbox.drain(send) == 1
+        assert sent == ['b1'], (
+            'Проверьте, что после ошибки отправки остальные уведомления '
+            'этого чата ждут, а другие чаты продолжают получать свои.'
+        )
+        assert list(outbox.pending) == ['a1', 'a2']
+
+    def test_compaction(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        outbox = Outbox(path, compact_after=10)
+        for number in range(20):
+            outbox.put(f'k{number}', '1', 'текст')
+        outbox.put('left', '1', 'текст')
+        outbox.commit()
+        outbox.drain(lambda notification: notification.key != 'left')
+        restored = Outbox(path)
+        assert list(restored.pending) == ['left']
+        assert not restored.put('k5', '1', 'текст')
+
+    def test_permanent_error_is_dead_lettered(self, tmp_path):
+        path = tmp_path / 'outbox.jsonl'
+        outbox = Outbox(path)
+        for number in range(10):
+            outbox.put(f'a{number}', 'a', 'текст')
+        outbox.put('b1', 'b', 'текст')
+        outbox.commit()
+
+        def send(notification):
+            if notification.chat_id == 'a':
+                raise Undeliverable('Forbidden: bot was blocked by the user')
+            return True
+
+        assert outbox.drain(send) == 1
+        assert len(outbox) == 0, (
+            'Проверьте, что недоставляемые уведомления снимаются с '
+            'очереди и не держат чат.'
+        )
+        assert outbox.dead == 10
+        assert len(Outbox(path)) == 0
+
+    def test_transient_error_backs_off_without_dropping(self):
+        outbox = Outbox(retry_base=60)
+        outbox.put('a1', 'a', 'a1')
+        outbox.put('a2', 'a', 'a2')
+        outbox.put('b1', 'b', 'b1')
+        for _ in range(20):
+            outbox.backoff.pop('a', None)
+            outbox.drain(lambda notification: notification.chat_id == 'b')
+        assert list(outbox.pending) == ['a1', 'a2'], (
+            'Проверьте, что после временных ошибок уведомления остаются '
+            'в очереди.'
+        )
+        assert outbox.dead == 0
+        assert outbox.drain(lambda notification: True) == 0, (
+            'Проверьте, что чат после ошибки ждёт повтора.'
+        )
+        assert not outbox.waiting('a', now=time.monotonic() + 61)
+        outbox.backoff['a'] = (1, 0.0)
+        assert outbox.drain(lambda notification: True) == 2
+        assert outbox.backoff == {}
+
+    def test_deliver_classifies_telegram_errors(self, homework_module):
+        class Bot:
+            def __init__(self, error):
+                self.error = error
+                self.sent = []
+
+            def send_message(self, chat_id, text):
+                if self.error and chat_id != 'new':
+                    raise self.error
+                self.sent.append(chat_id)
+
+        notification = Notification('k1', '1', 'текст')
+        for error in (telegram.error.Unauthorized(
+                          'Forbidden: bot was blocked by the user'),
+                      telegram.error.BadRequest('Bad Request: chat not found')):
+            with pytest.raises(Undeliverable):
+                homework_module.deliver(Bot(error), notification)
+        with pytest.raises(BotRevoked):
+            homework_module.deliver(
+                Bot(telegram.error.Unauthorized('Unauthorized')),
+                notification)
+        for error in (telegram.error.TimedOut(), telegram.error.RetryAfter(5),
+                      telegram.error.NetworkError('Bad Gateway')):
+            assert homework_module.deliver(Bot(error), notification) is False
+        bot = Bot(telegram.error.ChatMigrated('new'))
+        assert homework_module.deliver(bot, notification)
+        assert bot.sent == ['new'], (
+            'Проверьте, что уведомление для ставшей супергруппой группы '
+            'отправляется в новый чат.'
+        )
@@ -0,0 +1,48 @@
+import time
+import types
+
+from profiling import Profiler
+
+
+def make_module():
+    module = types.ModuleType('fake_homework')
+
+    def work(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    module.work = work
+    return module
+
+
+class TestProfiler:
+
+    def test_disabled_profiler_keeps_original_functions(self):
+        module = make_module()
+        original = module.work
+        profiler = Profiler(module, ('work',))
+        assert module.work is original, (
+            'Выключенный профилировщик не должен подменять функции.'
+        )
+        profiler.enable()
+        assert module.work is not original
+        profiler.disable()
+        assert module.work is original
+
+    def test_timings_and_stacks(self, tmp_path):
+        module = make_module()
+        output = tmp_path / 'stacks.folded'
+        profiler = Profiler(module, ('work',), output=output)
+        profiler.toggle()
+        profiler.apply()
+        assert module.work(0.05) == 0.05
+        assert profiler.stats['work'].calls == 1
+        assert profiler.stats['work'].total >= 0.05
+        assert 'work' in profiler.table()
+        profiler.toggle()
+        profiler.apply()
+        lines = output.read_text(encoding='utf-8').splitlines()
+        assert any(':work ' in line for line in lines), (
+            'Проверьте, что стеки пишутся в свёрнутом формате flamegraph.'
+        )
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
@@ -0,0 +1,85 @@
+import pytest
+import requests
+
+import utils
+from schema import Validator, field
+from subscriptions import Subscription
+
+
+SCHEMA = field(dict, fields={
+    'homeworks': field(list, items=field(dict, fields={
+        'homework_name': field(str),
+        'status': field(str, choices=('approved', 'rejected')),
+    })),
+    'current_date': field(int, required=False),
+})
+
+
+class TestSchema:
+    validator = Validator(SCHEMA, 'response')
+
+    def test_valid(self):
+        response = {'homeworks': [
+            {'homework_name': 'hw1', 'status': 'approved'},
+            {'homework_name': 'hw2', 'status': 'rejected', 'id': 2},
+        ]}
+        assert self.validator.is_valid(response)
+        assert self.validator.validate(response) is response
+
+    def test_collects_all_errors(self):
+        response = {'homeworks': [
+            {'homework_name': 'hw1', 'status': 'unknown'},
+            {'status': 'approved'},
+            'hw3',
+        ], 'current_date': 'today'}
+        assert not self.validator.is_valid(response)
+        messages = [problem.message
+                    for problem in self.validator.problems(response)]
+        assert len(messages) == 4, (
+            'Проверьте, что валидатор собирает все ошибки, а не только '
+            'первую.'
+        )
+        assert any('homeworks[1].homework_name' in message
+                   for message in messages)
+        with pytest.raises(ValueError, match='Ошибок в ответе API: 4'):
+            self.validator.validate(response)
+
+    @pytest.mark.parametrize('response, exception', (
+        ([], TypeError),
+        ({}, KeyError),
+        ({'homeworks': {}}, TypeError),
+    ))
+    def test_error_types(self, response, exception):
+        with pytest.raises(exception):
+            self.validator.validate(response)
+
+    def test_polled_homeworks_are_validated_once(
+            self, monkeypatch, homework_module):
+        calls = []
+        validate = homework_module.HOMEWORK_VALIDATOR.validate
+
+        def counted(homework):
+            calls.append(homework)
+            return validate(homework)
+
+        monkeypatch.setattr(homework_module.HOMEWORK_VALIDATOR, 'validate',
+                            counted)
+        monkeypatch.setattr(requests, 'get', utils.mock_homework_api({
+            'homeworks': [{'homework_name': f'hw{number}',
+                           'status': 'approved'} for number in range(3)],
+            'current_date': 1,
+        }))
+        notified = []
+        homework_module.poll_subscription(
+            utils.MockTelegramBot(),
+            lambda subscription, homework, message: notified.append(message),
+            Subscription('student', 'token', '1'), 0)
+        assert len(notified) == 3
+        assert calls == [], (
+            'Проверьте, что работы ответа, проверенного check_response, '
+            'не проверяются повторно в parse_status.'
+        )
+        with pytest.raises(ValueError):
+            homework_module.parse_status(
+                {'homework_name': 'hw', 'status': 'unknown'})
+        assert len(calls) == 1
@@ -0,0 +1,112 @@
+import signal
+import time
+
+import pytest
+
+import state
+import subscriptions
+import utils
+from bot_pool import BotPool
+from exceptions import ShutdownRequested
+from outbox import Outbox
+from shutdown import GracefulShutdown
+
+
+@pytest.fixture
+def shutdown():
+    shutdown = GracefulShutdown(deadline=60)
+    yield shutdown
+    shutdown.restore()
+
+
+class TestShutdown:
+
+    def test_signal_during_work_only_sets_flag(self, shutdown):
+        shutdown.handle(signal.SIGTERM, None)
+        assert shutdown.requested.is_set(), (
+            'Проверьте, что сигнал остановки запоминается.'
+        )
+
+    def test_signal_interrupts_sleep(self, shutdown):
+        with pytest.raises(ShutdownRequested):
+            with shutdown.interruptible():
+                shutdown.handle(signal.SIGTERM, None)
+
+    def test_interruptible_after_signal(self, shutdown):
+        shutdown.handle(signal.SIGTERM, None)
+        with pytest.raises(ShutdownRequested):
+            with shutdown.interruptible():
+                raise AssertionError(
+                    'Убедитесь, что после сигнала остановки бот '
+                    'не засыпает снова.'
+                )
+
+    def test_state_roundtrip(self, tmp_path):
+        path = tmp_path / 'state.json'
+        assert state.load_state(path) == {}
+        state.save_state(path, {'alice': 150})
+        registry = subscriptions.SubscriptionRegistry(state.load_state(path))
+        alice = subscriptions.Subscription('alice', 'a', '1')
+        registry.apply(subscriptions.Config({}, {'alice': alice}), 300)
+        assert registry.snapshot() == {'alice': 150}, (
+            'Проверьте, что после перезапуска опрос продолжается '
+            'с сохранённой метки времени.'
+        )
+
+    def test_cleanup_has_its_own_budget(self, shutdown):
+        shutdown.install()
+        shutdown.handle(signal.SIGTERM, None)
+        shutdown.disarm()
+        assert signal.alarm(0) == 0, (
+            'Проверьте, что таймер остановки снимается перед сохранением '
+            'состояния.'
+        )
+        started = time.monotonic()
+        with shutdown.bounded(1):
+            time.sleep(5)
+        assert time.monotonic() - started < 3, (
+            'Проверьте, что необязательный шаг завершения обрывается '
+            'по своему сроку.'
+        )
+
+    def test_signal_during_cleanup_does_not_arm_deadline(self, shutdown):
+        shutdown.disarm()
+        shutdown.handle(signal.SIGTERM, None)
+        assert signal.alarm(0) == 0
+
+    def test_final_drain_sends_queue_within_deadline(
+            self, shutdown, monkeypatch, homework_module):
+        class SlowBot(utils.MockTelegramBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                if chat_id == 'slow':
+                    time.sleep(3)
+                sent.append(chat_id)
+
+        sent = []
+        monkeypatch.setattr(homework_module, 'OUTBOX_DRAIN_DEADLINE', 1)
+        pool = BotPool()
+        pool.add('1:token', SlowBot()).interval = 0
+        outbox = Outbox()
+        outbox.put('k1', 'fast', 'текст')
+        outbox.put('k2', 'slow', 'текст')
+        shutdown.install()
+        started = time.monotonic()
+        homework_module.drain_outbox(pool, outbox, shutdown)
+        assert time.monotonic() - started < 2.5, (
+            'Проверьте, что отправка очереди при остановке ограничена '
+            'по времени.'
+        )
+        assert sent == ['fast'], (
+            'Проверьте, что при остановке очередь отправки разбирается.'
+        )
+        assert list(outbox.pending) == ['k2']
+
+    def test_progress_requires_durable_outbox(
+            self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'STATE_FILE', 'state.json')
+        monkeypatch.setattr(homework_module, 'OUTBOX_PATH', None)
+        assert not homework_module.check_config(), (
+            'Проверьте, что STATE_FILE без OUTBOX_PATH не принимается.'
+        )
+        monkeypatch.setattr(homework_module, 'OUTBOX_PATH', 'outbox.jsonl')
+        assert homework_module.check_config()
@@ -0,0 +1,69 @@
+import json
+
+import subscriptions
+
+
+def write_config(path, settings, items):
+    path.write_text(json.dumps({
+        'settings': settings,
+        'subscriptions': items,
+    }), encoding='utf-8')
+
+
+class TestSubscriptions:
+    ALICE = {'name': 'alice', 'practicum_token': 'a', 'chat_id': '1'}
+    BOB = {'name': 'bob', 'practicum_token': 'b', 'chat_id': '2'}
+
+    def test_load_config(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write_config(path, {'retry_period': 60},
+                     [self.ALICE, dict(self.BOB, priority=1)])
+        config = subscriptions.load_config(path)
+        assert config.settings == {'retry_period': 60}
+        assert set(config.subscriptions) == {'alice', 'bob'}, (
+            'Проверьте, что все подписки из файла загружены.'
+        )
+        assert config.subscriptions['alice'].priority == 0
+        assert config.subscriptions['bob'].priority == 1
+
+    def test_apply_keeps_timestamps_of_unchanged(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write_config(path, {}, [self.ALICE, self.BOB])
+        registry = subscriptions.SubscriptionRegistry()
+        registry.apply(subscriptions.load_config(path), 100)
+        registry.advance('alice', 150)
+
+        write_config(path, {'retry_period': 60},
+                     [dict(self.ALICE, chat_id='3'),
+                      {'name': 'carol', 'practicum_token': 'c',
+                       'chat_id': '4'}])
+        diff = registry.apply(subscriptions.load_config(path), 200)
+
+        assert [s.name for s in diff.added] == ['carol']
+        assert diff.removed == ['bob']
+        assert [s.chat_id for s in diff.changed] == ['3']
+        assert diff.settings == {'retry_period': 60}
+        assert dict((s.name, ts) for s, ts in registry.items()) == {
+            'alice': 150, 'carol': 200
+        }, (
+            'Проверьте, что перезагрузка не сбрасывает прогресс '
+            'оставшихся подписок.'
+        )
+
+    def test_advance_ignores_removed_subscription(self):
+        registry = subscriptions.SubscriptionRegistry()
+        registry.advance('ghost', 100)
+        assert registry.items() == []
+
+    def test_watcher_keeps_config_on_error(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write_config(path, {}, [self.ALICE])
+        registry = subscriptions.SubscriptionRegistry()
+        watcher = subscriptions.ConfigWatcher(path, registry)
+        watcher.reload(100)
+        path.write_text('{broken', encoding='utf-8')
+        assert watcher.changed()
+        assert watcher.reload(200) is None
+        assert [s.name for s, _ in registry.items()] == ['alice'], (
+            'Проверьте, что ошибка в файле не сбрасывает подписки.'
+        )
@@ -0,0 +1,74 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import utils
+from bot_pool import BotPool
+from outbox import Outbox
+from shutdown import GracefulShutdown
+from state import load_state
+from subscriptions import Config, Subscription, SubscriptionRegistry
+
+
+class TestThreadPool:
+
+    def test_poll_all_in_thread_pool(self, monkeypatch, homework_module):
+        threads = set()
+
+        def answer(token, from_date):
+            threads.add(threading.get_ident())
+            return {
+                'homeworks': [{'homework_name': token, 'status': 'approved'}],
+                'current_date': from_date + 1,
+            }
+
+        monkeypatch.setattr(requests, 'get',
+                            utils.mock_homework_api(answer, delay=0.05))
+        subscriptions = {
+            f'student{number}': Subscription(
+                f'student{number}', f'token{number}', str(number))
+            for number in range(8)
+        }
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, subscriptions), 100)
+        pool = BotPool()
+        pool.add('1:token', utils.MockTelegramBot())
+        outbox = Outbox()
+        notify = functools.partial(homework_module.enqueue, outbox)
+        with ThreadPoolExecutor(4) as executor:
+            homework_module.poll_all(pool, notify, registry,
+                                     GracefulShutdown(), executor=executor)
+
+        assert len(threads) > 1
+        assert registry.snapshot() == {name: 101 for name in subscriptions}
+        assert sorted(
+            (item.chat_id, item.text.split('"')[1])
+            for item in outbox.queue()
+        ) == sorted(
+            (subscription.chat_id, subscription.practicum_token)
+            for subscription in subscriptions.values()
+        ), (
+            'Проверьте, что в пуле потоков каждая подписка опрашивается '
+            'со своим токеном и пишет в свой чат.'
+        )
+
+    def test_checkpoint_skips_progress_after_commit(
+            self, tmp_path, monkeypatch, homework_module):
+        state_file = tmp_path / 'state.json'
+        monkeypatch.setattr(homework_module, 'STATE_FILE', str(state_file))
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, {'a': Subscription('a', 'token', '1')}), 1)
+
+        class LateOutbox(Outbox):
+            def commit(self):
+                super().commit()
+                self.put('late', '1', 'опоздавшее уведомление')
+                registry.advance('a', 2)
+
+        homework_module.checkpoint(LateOutbox(), registry)
+        assert load_state(state_file) == {'a': 1}, (
+            'Проверьте, что метка времени, сдвинутая опросом после '
+            'фиксации outbox, не сохраняется раньше его уведомлений.'
+        )
@@ -0,0 +1,88 @@
+import time
+
+import utils
+from bot_pool import BotPool
+from fake_server import FakeServer
+from shutdown import GracefulShutdown
+from subscriptions import Config, Subscription, SubscriptionRegistry
+from tokens import TokenCheck, TokenQuarantine, TokenValidator
+
+
+class TestTokens:
+
+    def test_quarantine_backoff_doubles_and_resets(self):
+        quarantine = TokenQuarantine(base=10, maximum=25)
+        assert quarantine.fail('t', now=0) == 10
+        assert quarantine.fail('t', now=0) == 20
+        assert quarantine.fail('t', now=0) == 25
+        assert quarantine.blocked('t', now=24)
+        assert not quarantine.blocked('t', now=26)
+        assert quarantine.release('t')
+        assert quarantine.fail('t', now=0) == 10
+
+    def test_thousands_of_tokens_are_validated_concurrently(self):
+        revoked = tuple(f'bad{number}' for number in range(50))
+        with FakeServer(latency=0.02, revoked_tokens=revoked) as server:
+            validator = TokenValidator(server.endpoint, server.telegram_url)
+            checks = [TokenCheck('practicum', f's{number}', f'good{number}')
+                      for number in range(1000)]
+            checks += [TokenCheck('practicum', token, token)
+                       for token in revoked]
+            checks.append(TokenCheck('telegram', 'bot', '123:revoked'))
+            server.state.settings.revoked_tokens += ('123:revoked',)
+            started = time.monotonic()
+            rejected = validator.validate(checks)
+            elapsed = time.monotonic() - started
+        assert {check.token for check in rejected} == set(revoked) | {
+            '123:revoked'}
+        assert elapsed < 5, (
+            'Проверьте, что токены проверяются параллельно.'
+        )
+        assert validator.blocked('bad0')
+        assert not validator.blocked('good0')
+        assert validator.due(checks) == [], (
+            'Проверьте, что токены не перепроверяются до срока.'
+        )
+
+    def test_network_errors_do_not_quarantine(self):
+        validator = TokenValidator('http://127.0.0.1:9/', workers=2)
+        assert validator.validate([TokenCheck('practicum', 's', 't')]) == []
+        assert not validator.blocked('t')
+        assert validator.due([TokenCheck('practicum', 's', 't')])
+
+    def test_not_found_rejects_only_telegram_tokens(self):
+        with FakeServer() as server:
+            validator = TokenValidator(server.endpoint + 'missing/',
+                                       server.telegram_url, workers=2)
+            rejected = validator.validate([
+                TokenCheck('practicum', 's', 'good'),
+                TokenCheck('telegram', 'bot', 'unknown/token')])
+        assert [check.kind for check in rejected] == ['telegram'], (
+            'Проверьте, что ответ 404 Практикума не отклоняет токен: '
+            'это ошибка адреса, а не токена.'
+        )
+        assert not validator.blocked('good')
+
+    def test_quarantined_subscription_is_not_polled(
+            self, monkeypatch, homework_module):
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', '1:token')
+        registry = SubscriptionRegistry()
+        registry.apply(Config({}, {
+            name: Subscription(name, name, '1') for name in ('good', 'bad')
+        }), 0)
+        pool = BotPool()
+        pool.add('1:token', utils.MockTelegramBot())
+        polled = []
+        monkeypatch.setattr(
+            homework_module, 'poll_subscription',
+            lambda bot, notify, subscription, timestamp, observe=None:
+            polled.append(subscription.name) or timestamp)
+        with FakeServer(revoked_tokens=('bad',)) as server:
+            validator = TokenValidator(server.endpoint, server.telegram_url)
+            homework_module.refresh_tokens(pool, registry, validator)
+        homework_module.poll_all(pool, None, registry, GracefulShutdown(),
+                                 admit=homework_module.admission(
+                                     validator=validator))
+        assert polled == ['good'], (
+            'Проверьте, что подписки с отклонённым токеном не опрашиваются.'
+        )
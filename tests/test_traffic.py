@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import requests
+
+import utils
+from traffic import ReplayBot, TrafficRecorder, replay
+
+
+class TestTraffic:
+    DATA = {
+        'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+        'current_date': 1000198991,
+    }
+
+    def test_capture_and_replay(self, tmp_path, monkeypatch,
+                                homework_module):
+        monkeypatch.setattr(requests, 'get',
+                            utils.mock_homework_api(self.DATA))
+        monkeypatch.setattr(homework_module, 'HEADERS',
+                            {'Authorization': 'OAuth secret-token'})
+        path = tmp_path / 'capture.jsonl.gz'
+        recorder = TrafficRecorder(homework_module, path,
+                                   secrets=['1234:abcdefg']).start()
+        try:
+            response = homework_module.get_api_answer(0)
+            message = homework_module.parse_status(
+                homework_module.check_response(response)[0])
+            homework_module.send_message(
+                utils.MockTelegramBot(), message + ' 1234:abcdefg')
+        finally:
+            recorder.stop()
+
+        assert homework_module.get_api_answer.__name__ == 'get_api_answer'
+        assert not hasattr(homework_module.get_api_answer, '__wrapped__'), (
+            'Проверьте, что после записи возвращаются исходные функции.'
+        )
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            content = file.read()
+        assert '1234:abcdefg' not in content, (
+            'Проверьте, что токены не попадают в запись.'
+        )
+
+        bot = ReplayBot()
+        stats = replay(path, homework_module, speed=0, bot=bot)
+        assert stats['api'] == 1
+        assert [text for _, text in bot.sent] == [message]
+
+    def test_replay_honours_elapsed_and_counts_duplicates(
+            self, tmp_path, homework_module):
+        message = homework_module.parse_status(self.DATA['homeworks'][0])
+        records = [
+            {'kind': 'api', 't': 0, 'subscription': 'student',
+             'chat_id': '1', 'from_date': 0, 'response': self.DATA,
+             'elapsed': 0.3},
+            {'kind': 'api', 't': 0.3, 'subscription': 'student',
+             'chat_id': '1', 'from_date': 0,
+             'error': 'ConnectionError: нет сети', 'elapsed': 0.2},
+            {'kind': 'send', 't': 0.3, 'chat_id': '1', 'text': message},
+            {'kind': 'send', 't': 0.3, 'chat_id': '1', 'text': message},
+        ]
+        path = tmp_path / 'capture.jsonl.gz'
+        with gzip.open(path, 'wt', encoding='utf-8') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+        bot = ReplayBot()
+        stats = replay(path, homework_module, speed=1, bot=bot)
+        assert stats['elapsed'] >= 0.5, (
+            'Проверьте, что воспроизведение выдерживает записанное время '
+            'ответа API.'
+        )
+        assert (stats['api'], stats['errors']) == (2, 1)
+        assert [chat_id for chat_id, _ in bot.sent] == ['1', '1']
+        assert stats['mismatches'] == 2, (
+            'Проверьте, что расхождения считаются с учётом повторов: '
+            'пропавший дубль и лишнее сообщение об ошибке.'
+        )
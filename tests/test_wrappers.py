@@ -0,0 +1,90 @@
+import types
+
+from liveness import Watchdog
+from profiling import Profiler
+from wrappers import WrapperRegistry
+
+
+def make_module():
+    module = types.ModuleType('fake_wrapped')
+
+    def work(calls):
+        calls.append('work')
+        return calls
+
+    module.work = work
+    return module
+
+
+def tagged(tag):
+    def wrap(function):
+        def wrapped(calls):
+            calls.append(tag)
+            return function(calls)
+        return wrapped
+    return wrap
+
+
+class TestWrappers:
+
+    def test_layers_compose_in_any_order(self):
+        module = make_module()
+        original = module.work
+        wrappers = WrapperRegistry(module)
+        wrappers.install('outer', {'work': tagged('outer')}, 2)
+        wrappers.install('inner', {'work': tagged('inner')}, 0)
+        wrappers.install('middle', {'work': tagged('middle')}, 1)
+        assert module.work([]) == ['outer', 'middle', 'inner', 'work'], (
+            'Проверьте, что слои обёрток собираются по глубине, '
+            'а не по порядку включения.'
+        )
+        wrappers.uninstall('middle')
+        assert module.work([]) == ['outer', 'inner', 'work']
+        wrappers.install('middle', {'work': tagged('middle')}, 1)
+        wrappers.uninstall('outer')
+        wrappers.uninstall('inner')
+        assert module.work([]) == ['middle', 'work']
+        wrappers.uninstall('middle')
+        assert module.work is original
+
+    def test_profiler_toggle_keeps_watchdog(self):
+        module = make_module()
+        original = module.work
+        profiler = Profiler(module, ('work',), sample=False)
+        watchdog = Watchdog(module, {'work': 5})
+        profiler.enable()
+        watchdog.enable()
+        try:
+            profiler.toggle()
+            profiler.apply()
+            assert module.work is not original, (
+                'Проверьте, что выключение профилировщика не снимает '
+                'обёртки сторожа.'
+            )
+            profiler.toggle()
+            profiler.apply()
+            assert module.work([]) == ['work']
+            assert profiler.stats['work'].calls == 1
+        finally:
+            watchdog.disable()
+        assert module.work is not original
+        profiler.disable()
+        assert module.work is original
+
+    def test_profiler_signal_only_requests_toggle(self):
+        module = make_module()
+        original = module.work
+        profiler = Profiler(module, ('work',), sample=False)
+        with profiler.lock:
+            profiler.toggle()
+        assert module.work is original and not profiler.enabled, (
+            'Проверьте, что обработчик сигнала не трогает обёртки и '
+            'блокировку профилировщика, а только запоминает запрос.'
+        )
+        profiler.apply()
+        assert profiler.enabled and module.work is not original
+        with profiler.lock:
+            profiler.toggle()
+        assert profiler.enabled
+        profiler.apply()
+        assert not profiler.enabled and module.work is original
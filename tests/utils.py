@@ -1,4 +1,5 @@
 import logging
+import time
 from collections import namedtuple
 from contextlib import contextmanager
 from http import HTTPStatus
@@ -91,6 +92,25 @@ class MockResponseGET:
         return data
 
 
+def mock_homework_api(answer, delay=0):
+    """Подмена `requests.get` для API Практикума.
+
+    `answer` — тело ответа или функция (токен, from_date) -> тело;
+    `delay` — сколько секунд отвечает API.
+    """
+    def mock_get(url, headers=None, params=None, **kwargs):
+        if delay:
+            time.sleep(delay)
+        body = answer
+        if callable(answer):
+            body = answer((headers or {}).get('Authorization', '').split()[-1],
+                          (params or {}).get('from_date'))
+        response = MockResponseGET()
+        response.json = lambda: body
+        return response
+    return mock_get
+
+
 class MockTelegramBot:
     def __init__(self, **kwargs):
         self._is_message_sent = False
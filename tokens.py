@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+VALIDATION_WORKERS = 64
+VALIDATION_TIMEOUT = 10
+REVALIDATE_PERIOD = 3600
+QUARANTINE_BASE = 60
+QUARANTINE_MAX = 6 * 3600
+TELEGRAM_URL = 'https://api.telegram.org/bot'
+REJECTED_CODES = {
+    'practicum': (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN),
+    'telegram': (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN,
+                 HTTPStatus.NOT_FOUND),
+}
+
+TOKEN_QUARANTINED = ('Токен {kind} «{name}» отклонён ({reason}), '
+                     'карантин на {backoff} с')
+TOKEN_RELEASED = 'Токен {kind} «{name}» снова действует'
+TOKENS_VALIDATED = ('Проверено токенов {count} за {elapsed:.2f} с: '
+                    'отклонено {rejected}, не удалось проверить {unknown}')
+
+TokenCheck = namedtuple('TokenCheck', ('kind', 'name', 'token'))
+
+
+class TokenQuarantine:
+    """Отклонённые токены и срок, до которого их не используют.
+
+    Срок растёт вдвое с каждой неудачной проверкой подряд, от `base`
+    до `maximum` секунд, и сбрасывается первой успешной.
+    """
+
+    def __init__(self, base=QUARANTINE_BASE, maximum=QUARANTINE_MAX):
+        """Карантин от `base` до `maximum` секунд."""
+        self.base = base
+        self.maximum = maximum
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.until = {}
+
+    def fail(self, token, now=None):
+        """Помещает токен в карантин; возвращает его длительность."""
+        now = time.time() if now is None else now
+        with self.lock:
+            failures = self.failures.get(token, 0) + 1
+            backoff = min(self.base * 2 ** (failures - 1), self.maximum)
+            self.failures[token] = failures
+            self.until[token] = now + backoff
+        return backoff
+
+    def release(self, token):
+        """Выпускает токен из карантина; возвращает, был ли он там."""
+        with self.lock:
+            self.until.pop(token, None)
+            return self.failures.pop(token, None) is not None
+
+    def blocked(self, token, now=None):
+        """Находится ли токен в карантине."""
+        now = time.time() if now is None else now
+        return self.until.get(token, 0) > now
+
+    def __len__(self):
+        """Число токенов, не прошедших последнюю проверку."""
+        return len(self.failures)
+
+
+class TokenValidator:
+    """Параллельная проверка токенов Практикума и Telegram.
+
+    Токен Практикума проверяется пустым запросом статусов с текущей
+    меткой времени, токен Telegram — методом getMe. Запросы идут из
+    пула потоков через общую сессию с пулом соединений, поэтому тысячи
+    токенов проверяются за секунды. Отклонённые токены попадают
+    в карантин; сетевые ошибки и ответы 5xx токен не отклоняют. Ответ
+    404 отклоняет только токен Telegram: так getMe отвечает на неверный
+    токен, а у Практикума 404 говорит о неверном адресе, а не о токене.
+    """
+
+    def __init__(self, endpoint, telegram_url=None,
+                 workers=VALIDATION_WORKERS, quarantine=None,
+                 revalidate_period=REVALIDATE_PERIOD):
+        """Готовит сессию с пулом на `workers` соединений."""
+        self.endpoint = endpoint
+        self.telegram_url = telegram_url or TELEGRAM_URL
+        self.workers = workers
+        self.quarantine = quarantine or TokenQuarantine()
+        self.revalidate_period = revalidate_period
+        self.checked = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, check):
+        """Запрос, которым проверяется токен."""
+        if check.kind == 'practicum':
+            return self.session.get(
+                self.endpoint, timeout=VALIDATION_TIMEOUT,
+                headers={'Authorization': f'OAuth {check.token}'},
+                params={'from_date': int(time.time())})
+        return self.session.get(f'{self.telegram_url}{check.token}/getMe',
+                                timeout=VALIDATION_TIMEOUT)
+
+    def check(self, check):
+        """Причина отказа, None для действующего токена или исключение."""
+        try:
+            response = self.request(check)
+        except requests.exceptions.RequestException as error:
+            return error
+        if response.status_code in REJECTED_CODES[check.kind]:
+            return f'HTTP {response.status_code}'
+        if response.status_code != HTTPStatus.OK:
+            return requests.HTTPError(f'HTTP {response.status_code}')
+        return None
+
+    def due(self, checks, now=None):
+        """Проверки, которые пора выполнить.
+
+        Новые токены проверяются сразу, токены в карантине — когда он
+        истёк, остальные — раз в `revalidate_period` секунд.
+        """
+        now = time.time() if now is None else now
+        return [check for check in checks
+                if not self.quarantine.blocked(check.token, now)
+                and (check.token in self.quarantine.failures
+                     or now - self.checked.get(check.token, -float('inf'))
+                     >= self.revalidate_period)]
+
+    def validate(self, checks):
+        """Проверяет токены параллельно и обновляет карантин.
+
+        Возвращает отклонённые проверки.
+        """
+        checks = list({check.token: check for check in checks}.values())
+        if not checks:
+            return []
+        started = time.monotonic()
+        with ThreadPoolExecutor(min(self.workers, len(checks)),
+                                thread_name_prefix='tokens') as executor:
+            results = list(executor.map(self.check, checks))
+        now = time.time()
+        rejected = []
+        unknown = 0
+        for check, result in zip(checks, results):
+            if isinstance(result, Exception):
+                unknown += 1
+                continue
+            self.checked[check.token] = now
+            if result is None:
+                if self.quarantine.release(check.token):
+                    logging.info(TOKEN_RELEASED.format(
+                        kind=check.kind, name=check.name))
+                continue
+            rejected.append(check)
+            logging.warning(TOKEN_QUARANTINED.format(
+                kind=check.kind, name=check.name, reason=result,
+                backoff=self.quarantine.fail(check.token, now)))
+        logging.info(TOKENS_VALIDATED.format(
+            count=len(checks), elapsed=time.monotonic() - started,
+            rejected=len(rejected), unknown=unknown))
+        return rejected
+
+    def blocked(self, token):
+        """Не использовать ли токен сейчас."""
+        return self.quarantine.blocked(token)
@@ -0,0 +1,295 @@
+"""Запись и воспроизведение трафика бота для воспроизводимых замеров.
+
+Запись включается переменной окружения TRAFFIC_CAPTURE=файл.jsonl.gz.
+Воспроизведение:
+
+    python traffic.py capture.jsonl.gz --speed 10
+"""
+import argparse
+import functools
+import gzip
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from exceptions import ReplayedError
+from outbox import Outbox
+from subscriptions import Subscription
+from wrappers import registry
+
+CAPTURE_STARTED = 'Запись трафика в {path}'
+CAPTURE_STOPPED = 'Запись трафика остановлена: записей {count}'
+REPLAY_REPORT = ('Воспроизведено за {elapsed:.2f} с: запросов к API {api}, '
+                 'ошибок API {errors}, сообщений {sent}, '
+                 'расхождений с записью {mismatches}')
+
+REDACTED = '***'
+SECRET_PATTERNS = (
+    re.compile(r'(OAuth )[^\s\'",}]+'),
+    re.compile(r'\d{5,}:[\w-]{30,}'),
+)
+
+
+def redact(text, secrets):
+    """Убирает токены из строки записи."""
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(
+            lambda match: (match.group(1) if match.groups() else '')
+            + REDACTED, text)
+    return text
+
+
+class TrafficRecorder:
+    """Записывает пары запрос-ответ get_api_answer и send_message.
+
+    Как и профилировщик, подменяет функции модуля обёртками только
+    на время записи. Записи — строки JSON в gzip со смещением времени
+    от начала записи; токены вырезаются до записи на диск. Обёртки
+    записи стоят поверх сторожа, поэтому брошенные по сроку вызовы
+    попадают в запись как ошибки.
+    """
+
+    depth = 1
+
+    def __init__(self, module, path, secrets=()):
+        """Готовит запись в `path`; строки из `secrets` вырезаются."""
+        self.module = module
+        self.path = path
+        self.secrets = [secret for secret in secrets if secret]
+        self.wrappers = registry(module)
+        self.lock = threading.Lock()
+        self.file = None
+        self.count = 0
+
+    def write(self, record):
+        """Дописывает одну запись."""
+        line = redact(json.dumps(record, ensure_ascii=False), self.secrets)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.count += 1
+
+    def offset(self):
+        """Секунды с начала записи."""
+        return round(time.monotonic() - self.started, 4)
+
+    def subscription(self):
+        """Имя подписки, для которой идёт запрос."""
+        subscription = self.module.SUBSCRIPTION.get()
+        return subscription.name if subscription else None
+
+    def wrap_api(self, function):
+        """Обёртка get_api_answer."""
+        @functools.wraps(function)
+        def recorded(timestamp):
+            record = {'kind': 'api', 't': self.offset(),
+                      'subscription': self.subscription(),
+                      'chat_id': self.module.get_chat_id(),
+                      'from_date': timestamp}
+            started = time.perf_counter()
+            try:
+                response = function(timestamp)
+                record['response'] = response
+                return response
+            except Exception as error:
+                record['error'] = f'{type(error).__name__}: {error}'
+                raise
+            finally:
+                record['elapsed'] = round(time.perf_counter() - started, 4)
+                self.write(record)
+        return recorded
+
+    def wrap_send(self, function):
+        """Обёртка send_message."""
+        @functools.wraps(function)
+        def recorded(bot, message):
+            record = {'kind': 'send', 't': self.offset(),
+                      'chat_id': self.module.get_chat_id(), 'text': message}
+            started = time.perf_counter()
+            try:
+                record['ok'] = function(bot, message)
+                return record['ok']
+            finally:
+                record['elapsed'] = round(time.perf_counter() - started, 4)
+                self.write(record)
+        return recorded
+
+    def start(self):
+        """Начинает запись."""
+        self.file = gzip.open(self.path, 'at', encoding='utf-8')
+        self.started = time.monotonic()
+        self.wrappers.install(self, {'get_api_answer': self.wrap_api,
+                                     'send_message': self.wrap_send},
+                              self.depth)
+        logging.info(CAPTURE_STARTED.format(path=self.path))
+        return self
+
+    def stop(self):
+        """Возвращает исходные функции и закрывает файл."""
+        self.wrappers.uninstall(self)
+        with self.lock:
+            self.file.close()
+        logging.info(CAPTURE_STOPPED.format(count=self.count))
+
+
+def read_records(path):
+    """Записи из файла в порядке времени."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    return sorted(records, key=lambda record: record['t'])
+
+
+class ReplayBot:
+    """Бот, который только запоминает отправленные сообщения."""
+
+    def __init__(self, latency=0.0):
+        """Бот, «отправляющий» каждое сообщение за `latency` секунд."""
+        self.latency = latency
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Запоминает сообщение вместо отправки."""
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent.append((chat_id, text))
+
+
+class TrafficReplay:
+    """Прогоняет запись через тот же путь, что и живой опрос.
+
+    Вместо get_api_answer модуля подставляется заглушка, которая
+    отвечает записанным ответом или ошибкой за записанное время
+    `elapsed`. Опрос идёт через poll_subscription, уведомления — через
+    Outbox и deliver, поэтому замер включает и проверку ответа,
+    и очередь отправки. Заглушка стоит глубже остальных слоёв обёрток:
+    сторож и профилировщик видят её как исходную функцию.
+    """
+
+    depth = -1
+
+    def __init__(self, module, records, speed=1.0):
+        """Воспроизведение записей `records`, ускоренное в `speed` раз."""
+        self.module = module
+        self.records = records
+        self.speed = speed
+        self.wrappers = registry(module)
+        self.record = None
+        self.produced = []
+        self.stats = dict(api=0, errors=0, sent=0)
+
+    def wrap_api(self, function):
+        """Заглушка get_api_answer с записанным ответом."""
+        @functools.wraps(function)
+        def replayed(timestamp):
+            if self.speed:
+                time.sleep(self.record.get('elapsed', 0) / self.speed)
+            if 'error' in self.record:
+                raise ReplayedError(self.record['error'].split(': ', 1)[-1])
+            return self.record['response']
+        return self.wrap_counted(replayed)
+
+    def wrap_counted(self, function):
+        """Обёртка, считающая ошибки вызова."""
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+        return counted
+
+    def wrap_send(self, function):
+        """Обёртка send_message, запоминающая отправленные тексты."""
+        @functools.wraps(function)
+        def sent(bot, message):
+            self.produced.append(message)
+            ok = function(bot, message)
+            self.stats['sent'] += bool(ok)
+            return ok
+        return sent
+
+    def run(self, bot):
+        """Воспроизводит записи, отправляя сообщения в `bot`."""
+        outbox = Outbox()
+        notify = functools.partial(self.module.enqueue, outbox)
+        send = functools.partial(self.module.deliver, bot)
+        self.wrappers.install(self, {
+            'get_api_answer': self.wrap_api,
+            'check_response': self.wrap_counted,
+            'parse_status': self.wrap_counted,
+            'send_message': self.wrap_send,
+        }, self.depth)
+        started = time.monotonic()
+        try:
+            for record in self.records:
+                if record['kind'] != 'api':
+                    continue
+                if self.speed:
+                    delay = (record['t'] / self.speed
+                             - (time.monotonic() - started))
+                    if delay > 0:
+                        time.sleep(delay)
+                self.record = record
+                self.stats['api'] += 1
+                self.module.poll_subscription(bot, notify, Subscription(
+                    record['subscription'], None, record.get('chat_id')),
+                    record['from_date'])
+                outbox.drain(send)
+        finally:
+            self.wrappers.uninstall(self)
+        self.stats['elapsed'] = time.monotonic() - started
+        return self.stats
+
+
+def mismatches(expected, produced):
+    """Число сообщений, которых нет в одной из последовательностей.
+
+    Сообщения сравниваются с учётом повторов: лишний или пропавший
+    дубль тоже расхождение.
+    """
+    difference = Counter(expected)
+    difference.subtract(produced)
+    return sum(abs(count) for count in difference.values())
+
+
+def replay(path, module, speed=1.0, bot=None):
+    """Воспроизводит запись и сравнивает сообщения с записанными.
+
+    Ответы подаются с исходными интервалами и длительностью, ускоренными
+    в `speed` раз (0 — без пауз). Сообщения уходят в `bot`
+    (по умолчанию ReplayBot).
+    """
+    records = read_records(path)
+    replaying = TrafficReplay(module, records, speed)
+    stats = replaying.run(bot or ReplayBot())
+    stats['mismatches'] = mismatches(
+        [record['text'] for record in records if record['kind'] == 'send'],
+        replaying.produced)
+    logging.info(REPLAY_REPORT.format(**stats))
+    return stats
+
+
+def main():
+    """Воспроизведение записи из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='ускорение относительно записи, 0 — без пауз')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка отправки в Telegram, с')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, stream=sys.stdout)
+    # homework сам импортирует этот модуль для записи трафика.
+    import homework
+    stats = replay(args.path, homework, args.speed, ReplayBot(args.latency))
+    print(REPLAY_REPORT.format(**stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import threading
+import weakref
+
+
+REGISTRIES = weakref.WeakKeyDictionary()
+REGISTRIES_LOCK = threading.Lock()
+
+
+class WrapperRegistry:
+    """Слои обёрток над функциями одного модуля.
+
+    Профилировщик, запись трафика и сторож живости подменяют одни
+    и те же функции модуля. Каждый слой регистрирует здесь свои
+    обёртки, а реестр сам собирает цепочку от исходной функции:
+    слои с меньшей глубиной `depth` ближе к ней. Включение
+    и выключение слоя в любом порядке пересобирает цепочку из
+    оставшихся слоёв, а когда слоёв не осталось, возвращает исходную
+    функцию.
+    """
+
+    def __init__(self, module):
+        """Реестр обёрток функций модуля `module`."""
+        self.module = module
+        self.lock = threading.Lock()
+        self.originals = {}
+        self.layers = {}
+
+    def install(self, layer, wraps, depth):
+        """Добавляет слой: `wraps` — имя функции -> фабрика обёртки."""
+        with self.lock:
+            for name in wraps:
+                if name not in self.originals:
+                    self.originals[name] = getattr(self.module, name)
+            self.layers[layer] = (depth, wraps)
+            self.rebuild(wraps)
+
+    def uninstall(self, layer):
+        """Убирает слой, остальные обёртки остаются на месте."""
+        with self.lock:
+            _, wraps = self.layers.pop(layer, (None, {}))
+            self.rebuild(wraps)
+
+    def rebuild(self, names):
+        """Собирает заново цепочки обёрток функций `names`."""
+        layers = sorted(self.layers.values(), key=lambda item: item[0])
+        for name in names:
+            function = self.originals[name]
+            wrapped = False
+            for _, wraps in layers:
+                if name in wraps:
+                    function = wraps[name](function)
+                    wrapped = True
+            setattr(self.module, name, function)
+            if not wrapped:
+                del self.originals[name]
+
+
+def registry(module):
+    """Общий реестр обёрток модуля `module`."""
+    with REGISTRIES_LOCK:
+        if module not in REGISTRIES:
+            REGISTRIES[module] = WrapperRegistry(module)
+        return REGISTRIES[module]